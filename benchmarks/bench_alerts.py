@@ -0,0 +1,99 @@
+"""Backfill throughput of the alert pipeline over Transfer, Swap, Mint and Burn logs.
+
+Replays synthetic logs for one token and its WBNB pair (or a recorded
+`eth_getLogs` dump passed as the first argument) through AlertPipeline, with a
+node that refuses any request returning more than RESULT_LIMIT logs. Run from
+the repository root with `python -m benchmarks.bench_alerts [logs.json]`.
+"""
+import random
+import sys
+import time
+
+from eth_abi import encode_abi
+
+from benchmarks.mock_rpc import random_address
+from pricebot.alerts import WBNB, AlertPipeline
+from pricebot.events import BURN_TOPIC, MINT_TOPIC, SWAP_TOPIC, TRANSFER_TOPIC, ReplayLogSource, as_int
+
+BLOCKS = 50_000
+RESULT_LIMIT = 5000
+PRICE, BNB_PRICE = 2.0, 300.0
+THRESHOLDS = {'buy': 10_000, 'sell': 10_000, 'transfer': 50_000, 'liquidity': 25_000}
+E18 = 10 ** 18
+
+
+class LimitedLogSource(ReplayLogSource):
+    def get_logs(self, addresses, topics, from_block, to_block='latest'):
+        logs = super().get_logs(addresses, topics, from_block, to_block)
+        if len(logs) > RESULT_LIMIT:
+            raise ValueError(f'query returned more than {RESULT_LIMIT} results')
+        return logs
+
+
+def topic(address):
+    return '0x' + '0' * 24 + address[2:].lower()
+
+
+def synthetic_logs(token, lp, blocks=BLOCKS):
+    rng = random.Random(1)
+    wallets = [random_address(f'wallet{i}') for i in range(50)]
+    logs = []
+
+    def log(address, topics, types, values, block):
+        logs.append({
+            'address': address, 'topics': topics, 'data': '0x' + encode_abi(types, values).hex(),
+            'blockNumber': block, 'logIndex': len(logs), 'transactionHash': '0x%064x' % len(logs),
+        })
+
+    for block in range(1, blocks + 1):
+        for _ in range(rng.randrange(4)):
+            tokens = int(rng.lognormvariate(8, 2) * E18)
+            sender, receiver = rng.sample(wallets, 2)
+            kind = rng.random()
+            if kind < 0.7:
+                bnb = tokens * 2 // 300
+                buy = rng.random() < 0.5
+                amounts = [0, bnb, tokens, 0] if buy else [tokens, 0, 0, bnb]
+                log(token, [TRANSFER_TOPIC, topic(lp if buy else sender), topic(sender if buy else lp)],
+                    ['uint256'], [tokens], block)
+                log(lp, [SWAP_TOPIC, topic(sender), topic(sender)], ['uint256'] * 4, amounts, block)
+            elif kind < 0.95:
+                log(token, [TRANSFER_TOPIC, topic(sender), topic(receiver)], ['uint256'], [tokens], block)
+            else:
+                log(lp, [rng.choice((MINT_TOPIC, BURN_TOPIC)), topic(sender)], ['uint256'] * 2,
+                    [tokens, tokens * 2 // 300], block)
+    return logs
+
+
+def main():
+    token, lp = random_address('token'), random_address('lp')
+    if len(sys.argv) > 1:
+        source = LimitedLogSource.from_file(sys.argv[1])
+    else:
+        source = LimitedLogSource(synthetic_logs(token, lp))
+
+    first, last = as_int(source.logs[0]['blockNumber']), as_int(source.logs[-1]['blockNumber'])
+    source.head = last
+    pair = sorted((token, WBNB), key=str.lower)
+
+    for page in (500, 2000, 10_000):
+        source.calls = 0
+        pipeline = AlertPipeline(source, token, lp, pair, 18, THRESHOLDS, checkpoint=first - 1, page=page, max_pages=10)
+        found = []
+        polls = 0
+        started = time.perf_counter()
+        caught_up = False
+        while not caught_up:
+            alerts, caught_up = pipeline.poll(PRICE, BNB_PRICE)
+            found.extend(alerts)
+            polls += 1
+        elapsed = time.perf_counter() - started
+
+        kinds = ' '.join(f"{kind}={sum(alert.kind == kind for alert in found)}" for kind in ('buy', 'sell', 'transfer', 'add', 'remove'))
+        print(f"page {page:>6}  {last - first + 1} blocks in {elapsed * 1000:8.1f} ms"
+              f"  {(last - first + 1) / elapsed:10.0f} blocks/s  {pipeline.logs_seen / elapsed:9.0f} logs/s"
+              f"  {source.calls:4} getLogs  {polls:3} polls  {kinds}")
+
+
+if __name__ == '__main__':
+    main()
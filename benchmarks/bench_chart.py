@@ -0,0 +1,68 @@
+"""Chart render time and cache hit rate over a week of stored price history.
+
+Run from the repository root with `python -m benchmarks.bench_chart [database]`;
+the database file (bench_chart.db by default) is recreated on every run.
+"""
+import asyncio
+import math
+import random
+import sys
+import time
+
+from pricebot.chart import ChartRenderer, render_candles
+from pricebot.commands.models import prices
+from pricebot.dbwriter import DBWriter, create_db_engine
+from pricebot.history import DAY, HOUR, PriceHistory, parse_window
+
+TICK = 15
+WINDOWS = ('1h', '24h', '7d')
+REQUESTS = 2000
+BURST = 100
+
+
+async def bench_cache(charts, now, rng):
+    # Requests spread over two simulated hours, as users would ask during a busy stretch
+    for offset in sorted(rng.uniform(0, 2 * HOUR) for _ in range(REQUESTS)):
+        await charts.render(parse_window(rng.choice(WINDOWS)), now + offset)
+
+    stats = charts.cache.stats
+    hit_rate = stats['hits'] / max(sum(stats.values()), 1) * 100
+    print(f"{REQUESTS} requests: {stats['misses']} renders, {stats['hits']} cache hits ({hit_rate:.1f}%)")
+
+    misses = stats['misses']
+    started = time.perf_counter()
+    await asyncio.gather(*(charts.render(DAY, now + 3 * HOUR) for _ in range(BURST)))
+    print(f"burst of {BURST} identical requests: {stats['misses'] - misses} render(s) in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+def main():
+    engine = create_db_engine(f"sqlite:///{sys.argv[1] if len(sys.argv) > 1 else 'bench_chart.db'}")
+    prices.Base.metadata.drop_all(engine)
+    prices.Base.metadata.create_all(engine)
+    writer = DBWriter(engine)
+    history = PriceHistory(engine, writer, 'BENCH', batch_size=500)
+
+    rng = random.Random(19)
+    now = int(time.time())
+    price = 10.0
+    for timestamp in range(now - 7 * DAY, now, TICK):
+        price *= math.exp(rng.gauss(0, 0.001))
+        history.record(price, timestamp)
+    history.flush(now)
+    writer.flush()
+
+    for window in WINDOWS:
+        candles = history.candles(parse_window(window), now)
+        started = time.perf_counter()
+        for _ in range(10):
+            png = render_candles(candles)
+        print(f"{window:>4} render {(time.perf_counter() - started) / 10 * 1000:7.2f} ms"
+              f" ({len(candles)} candles, {len(png):,} byte PNG)")
+
+    asyncio.get_event_loop().run_until_complete(bench_cache(ChartRenderer(history), now, rng))
+    writer.close()
+
+
+if __name__ == '__main__':
+    main()
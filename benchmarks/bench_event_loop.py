@@ -0,0 +1,64 @@
+"""Event loop responsiveness while a node call hangs.
+
+A mock node sleeps on every request; a fake command handler keeps running on the
+loop and its latency is reported for the blocking and the executor-backed read paths.
+The run fails if the executor path lets a command wait longer than MAX_LAG.
+Run from the repository root with `python -m benchmarks.bench_event_loop`.
+"""
+import asyncio
+import statistics
+import time
+
+from web3 import Web3
+
+from benchmarks.bench_reads import ERC20_ABI, setup_node
+from benchmarks.mock_rpc import MockNode
+from pricebot.chain import ChainReader
+
+NODE_LATENCY = 2.0
+MAX_LAG = 0.1  # Seconds a command may wait on the loop while an executor read hangs
+
+
+async def command_latencies(duration, interval=0.05):
+    latencies = []
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        latencies.append(time.perf_counter() - start - interval)
+    return latencies
+
+
+async def measure(reader, reads, blocking):
+    async def tick():
+        if blocking:
+            reader.read(reads)
+        else:
+            try:
+                await reader.read_async(reads, timeout=NODE_LATENCY / 2)
+            except asyncio.TimeoutError:
+                pass
+
+    latencies, _ = await asyncio.gather(command_latencies(NODE_LATENCY * 1.5), tick())
+    return latencies
+
+
+def main():
+    node = MockNode(latency=NODE_LATENCY)
+    web3 = Web3(Web3.HTTPProvider(node.start()))
+    addresses = setup_node(node)
+    contracts = {name: web3.eth.contract(address=address, abi=ERC20_ABI) for name, address in addresses.items()}
+    reader = ChainReader(web3)
+    reads = {'lp_supply': (contracts['lp'], 'totalSupply')}
+
+    for label, blocking in (('blocking read', True), ('executor read', False)):
+        latencies = asyncio.run(measure(reader, reads, blocking))
+        print(f"{label:<15} command lag p50 {statistics.median(latencies) * 1000:8.2f} ms  max {max(latencies) * 1000:8.2f} ms")
+
+    node.stop()
+    if max(latencies) > MAX_LAG:
+        raise SystemExit(f'A hanging executor read held up commands for {max(latencies) * 1000:.0f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Node calls and price latency for Sync-event updates versus fixed balance polling.
+
+Replays synthetic Sync logs (or a recorded `eth_getLogs` dump passed as the first
+argument) through SyncWatcher. Run from the repository root with
+`python -m benchmarks.bench_events [logs.json]`.
+"""
+import random
+import sys
+from bisect import bisect_left, bisect_right
+
+from eth_abi import encode_abi
+
+from benchmarks.mock_rpc import random_address
+from pricebot.events import SYNC_TOPIC, ReplayLogSource, SyncWatcher
+
+BLOCK_TIME = 3
+REFRESH_RATE = 15
+RESYNC_RATE = 300
+
+
+def synthetic_logs(pairs, blocks=10_000, trade_probability=0.05):
+    rng = random.Random(1)
+    logs = []
+    for block in range(1, blocks + 1):
+        for index, pair in enumerate(pairs):
+            if rng.random() < trade_probability:
+                reserves = [rng.randrange(10 ** 20, 10 ** 24), rng.randrange(10 ** 20, 10 ** 24)]
+                logs.append({
+                    'address': pair, 'topics': [SYNC_TOPIC], 'data': '0x' + encode_abi(['uint112', 'uint112'], reserves).hex(),
+                    'blockNumber': block, 'logIndex': index,
+                })
+    return logs
+
+
+def delays(event_blocks, heads):
+    """Seconds from each event's block to the first poll at or after it, which is when the price shows it."""
+    waits = []
+    for block in event_blocks:
+        index = bisect_left(heads, block)
+        if index < len(heads):
+            waits.append((heads[index] - block) * BLOCK_TIME)
+    return waits
+
+
+def describe(waits):
+    return f"{sum(waits) / len(waits):5.1f}s mean, {max(waits):>2}s worst-case delay from a trade's block to its price, in whole blocks"
+
+
+def main():
+    if len(sys.argv) > 1:
+        source = ReplayLogSource.from_file(sys.argv[1])
+        pairs = sorted({log['address'] for log in source.logs})
+    else:
+        pairs = [random_address('lp'), random_address('bnb_lp')]
+        source = ReplayLogSource(synthetic_logs(pairs))
+
+    first, last = source.blocks[0], source.blocks[-1]
+    seconds = (last - first + 1) * BLOCK_TIME
+    print(f"blocks replayed       {last - first + 1}")
+
+    # A balance read sees every trade up to the block it runs at, so it shares the delay of a poll at the same heads
+    heads = list(range(first, last + 1, REFRESH_RATE // BLOCK_TIME))
+    print(f"polling every {REFRESH_RATE}s      {len(heads):>6} requests, {describe(delays(source.blocks, heads))}")
+
+    for poll_rate in (REFRESH_RATE, 3):
+        source.calls = 0
+        watcher = SyncWatcher(source, {pair: ('reserve0', 'reserve1') for pair in pairs})
+        watcher.start(first - 1)
+
+        waits = []
+        for head in range(first, last + 1, poll_rate // BLOCK_TIME or 1):
+            source.head = head
+            applied_from = watcher.last_block
+            watcher.poll()
+            # Every Sync up to the head is applied by this poll
+            applied = source.blocks[bisect_right(source.blocks, applied_from):bisect_right(source.blocks, head)]
+            waits.extend((head - block) * BLOCK_TIME for block in applied)
+
+        # Every resync_rate seconds a full balance read takes the place of that poll's getLogs
+        resyncs = seconds // RESYNC_RATE
+        print(f"sync events every {poll_rate:>2}s {source.calls:>6} requests ({source.calls - resyncs} getLogs + {resyncs} resyncs),"
+              f" {describe(waits)}")
+
+
+if __name__ == '__main__':
+    main()
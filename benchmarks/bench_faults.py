@@ -0,0 +1,80 @@
+"""Node load and recovery during an outage, with and without the circuit breaker.
+
+Ticks read a price snapshot every TICK seconds from a mock node that fails every
+request for OUTAGE seconds, then recovers. The breaker must at least halve the
+requests the node sees during the outage, and reads must recover within
+MAX_RECOVERY seconds of it, or the run fails. Run from the repository root with
+`python -m benchmarks.bench_faults`.
+"""
+import time
+
+from web3 import Web3
+
+from benchmarks.bench_reads import ERC20_ABI, batched_tick, setup_node
+from benchmarks.mock_rpc import MockNode
+from pricebot.chain import ChainReader, CircuitBreaker, CircuitOpen, MULTICALL_ADDRESS
+
+TICK = 0.05
+BEFORE, OUTAGE, AFTER = 0.5, 3.0, 1.5
+STALE_AFTER = 1.0
+MAX_RECOVERY = 1.0  # Seconds after the outage by which reads must succeed again; the breaker backs off up to 0.8s
+
+
+def run(label, node, breaker):
+    web3 = Web3(Web3.HTTPProvider(node.start()))
+    addresses = setup_node(node)
+    contracts = {name: web3.eth.contract(address=address, abi=ERC20_ABI) for name, address in addresses.items()}
+    reader = ChainReader(web3, MULTICALL_ADDRESS, breaker=breaker)
+
+    node.reset_counters()
+    started = time.monotonic()
+    outage_started = started + BEFORE
+    outage_ended = outage_started + OUTAGE
+    last_good = started
+    outage_requests = None
+    during = 0
+    recovered = None
+    results = {'ok': 0, 'failed': 0, 'short-circuited': 0}
+    stale_ticks = 0
+
+    while (now := time.monotonic()) < outage_ended + AFTER:
+        if outage_requests is None and now >= outage_started:
+            node.fail_for(OUTAGE)
+            outage_requests = node.round_trips
+
+        try:
+            batched_tick(reader, contracts, addresses)
+        except CircuitOpen:
+            results['short-circuited'] += 1
+        except Exception:
+            results['failed'] += 1
+        else:
+            results['ok'] += 1
+            last_good = time.monotonic()
+            if recovered is None and last_good >= outage_ended:
+                recovered = last_good - outage_ended
+
+        # What the bot would mark as stale in its nickname and embeds
+        stale_ticks += time.monotonic() - last_good >= STALE_AFTER
+        if time.monotonic() < outage_ended and outage_requests is not None:
+            during = node.round_trips - outage_requests
+        time.sleep(max(0, TICK - (time.monotonic() - now)))
+
+    node.stop()
+    counts = '  '.join(f"{name} {count:3}" for name, count in results.items())
+    print(f"{label:<12} {during:4} node requests during the {OUTAGE:.0f}s outage  {counts}"
+          f"  recovered after {recovered if recovered is not None else float('nan'):.2f}s  {stale_ticks} ticks marked stale")
+    if recovered is None or recovered > MAX_RECOVERY:
+        raise SystemExit(f'{label}: reads did not recover within {MAX_RECOVERY:.1f}s of the outage')
+    return during
+
+
+def main():
+    unguarded = run('no breaker', MockNode(), CircuitBreaker(threshold=float('inf')))
+    guarded = run('breaker', MockNode(), CircuitBreaker(threshold=3, backoff=0.1, max_backoff=0.8))
+    if guarded * 2 > unguarded:
+        raise SystemExit(f'The breaker did not halve node requests during the outage ({guarded} vs {unguarded})')
+
+
+if __name__ == '__main__':
+    main()
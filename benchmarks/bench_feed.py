@@ -0,0 +1,88 @@
+"""Node load and start-up time for bot processes subscribed to one price feed.
+
+Subscribers are plain socket clients spread over a few distinct token pairs, as
+separate bot processes would be. Run from the repository root with
+`python -m benchmarks.bench_feed`.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.bench_reads import setup_node
+from benchmarks.mock_rpc import MockNode, random_address
+from pricebot.chain import ChainReader, MULTICALL_ADDRESS
+from pricebot.feed import FeedServer, decode
+
+PAIRS = 5
+SUBSCRIBERS = (1, 10, 50)
+TICKS = 5
+REFRESH_RATE = 0.2
+
+
+def setup_pairs(node):
+    addresses = setup_node(node)
+    pairs = []
+    for i in range(PAIRS):
+        token, lp = random_address(f'token{i}'), random_address(f'lp{i}')
+        node.set_balance(token, lp, (i + 1) * 10 ** 24)
+        node.set_balance(addresses['bnb'], lp, (i + 1) * 10 ** 21)
+        node.set_supply(lp, 10 ** 22)
+        pairs.append({'token': token, 'lp': lp, 'amm': addresses['bnb_lp']})
+    return addresses, pairs
+
+
+async def subscribe(path, pair):
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(json.dumps(pair).encode() + b'\n')
+    await writer.drain()
+    return reader, writer
+
+
+async def bench(node, url, addresses, pairs, subscribers, path):
+    server = FeedServer(ChainReader(Web3(Web3.HTTPProvider(url)), MULTICALL_ADDRESS), path, REFRESH_RATE, addresses)
+    task = asyncio.ensure_future(server.serve())
+    while not os.path.exists(path):
+        await asyncio.sleep(0.01)
+
+    connections = [await subscribe(path, pairs[i % len(pairs)]) for i in range(subscribers)]
+    for reader, _ in connections:
+        decode(await reader.readline())
+
+    node.reset_counters()
+    for _ in range(TICKS):
+        for reader, _ in connections:
+            decode(await reader.readline())
+    calls = node.calls / TICKS
+
+    started = time.perf_counter()
+    reader, writer = await subscribe(path, pairs[0])
+    decode(await reader.readline())
+    late_start = (time.perf_counter() - started) * 1000
+
+    for _, connection in connections + [(reader, writer)]:
+        connection.close()
+    task.cancel()
+
+    print(f"{subscribers:>4} subscribers  {calls:>6.1f} eth_calls/tick (vs {subscribers * 5} polling alone)"
+          f"  late subscriber's first snapshot in {late_start:.2f} ms")
+
+
+def main():
+    node = MockNode(latency=0.005)
+    url = node.start()
+    addresses, pairs = setup_pairs(node)
+    loop = asyncio.get_event_loop()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for subscribers in SUBSCRIBERS:
+            loop.run_until_complete(bench(node, url, addresses, pairs, subscribers, os.path.join(workdir, f'feed{subscribers}.sock')))
+
+    node.stop()
+
+
+if __name__ == '__main__':
+    main()
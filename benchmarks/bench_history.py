@@ -0,0 +1,53 @@
+"""Insert a year of 15-second price ticks into PriceHistory and time rollup queries.
+
+Run from the repository root with `python -m benchmarks.bench_history [database]`;
+the database file (bench_history.db by default) is recreated on every run.
+"""
+import math
+import random
+import sys
+import time
+
+from pricebot.commands.models import prices
+from pricebot.dbwriter import DBWriter, create_db_engine
+from pricebot.history import DAY, PriceHistory, parse_window
+
+TICK = 15
+YEAR = 365 * DAY
+
+
+def main():
+    engine = create_db_engine(f"sqlite:///{sys.argv[1] if len(sys.argv) > 1 else 'bench_history.db'}")
+    prices.Base.metadata.drop_all(engine)
+    prices.Base.metadata.create_all(engine)
+    writer = DBWriter(engine)
+    history = PriceHistory(engine, writer, 'BENCH', batch_size=500)
+
+    rng = random.Random(1)
+    now = int(time.time())
+    price = 10.0
+    start = time.perf_counter()
+    ticks = 0
+    for timestamp in range(now - YEAR, now, TICK):
+        price *= math.exp(rng.gauss(0, 0.001))
+        history.record(price, timestamp)
+        ticks += 1
+    history.flush(now)
+    writer.flush()
+    elapsed = time.perf_counter() - start
+    print(f"inserted {ticks} ticks in {elapsed:.1f}s ({ticks / elapsed:,.0f} ticks/s)")
+
+    for window in ('1h', '24h', '7d', '30d', '1y'):
+        seconds = parse_window(window)
+        start = time.perf_counter()
+        for _ in range(100):
+            history.change(seconds, now)
+            history.range(seconds, now)
+        elapsed = (time.perf_counter() - start) / 200
+        print(f"{window:>4} change/range query {elapsed * 1000:7.3f} ms ({len(history.candles(seconds, now))} candles)")
+
+    writer.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Request latency through PoolProvider against stub nodes that inject latency and errors.
+
+Three local nodes are started: a steady one, one with occasional latency spikes,
+and one that fails most requests. The pool must cut the spiky node's p99, with
+the hedge delay capped at a multiple of the median; the uncapped p95 delay is
+shown for comparison. Run from the repository root with
+`python -m benchmarks.bench_pool`.
+"""
+import json
+import random
+import statistics
+import time
+
+from web3 import Web3
+
+from benchmarks.mock_rpc import MockNode
+from pricebot.rpc import PoolProvider
+
+REQUESTS = 300
+
+
+def spiky(rng, base, spike, probability):
+    return lambda: spike if rng.random() < probability else base
+
+
+def run(label, provider):
+    """Print and return the p99 latency of REQUESTS blockNumber calls."""
+    latencies = []
+    errors = 0
+    for _ in range(REQUESTS):
+        started = time.perf_counter()
+        try:
+            Web3(provider).eth.blockNumber
+        except Exception:
+            errors += 1
+        latencies.append(time.perf_counter() - started)
+
+    latencies.sort()
+    print(f"{label:<18} p50 {statistics.median(latencies) * 1000:7.1f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)] * 1000:7.1f} ms  errors {errors}")
+    return latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    rng = random.Random(1)
+    nodes = [
+        MockNode(latency=spiky(rng, 0.01, 0.5, 0.05), seed=1),
+        MockNode(latency=0.02, seed=2),
+        MockNode(latency=0.005, error_rate=0.7, seed=3),
+    ]
+    uris = [node.start() for node in nodes]
+
+    single = run('single spiky node', Web3.HTTPProvider(uris[0]))
+    run('pool, p95 hedge', PoolProvider(uris, timeout=2, hedge_multiple=None))
+
+    pool = PoolProvider(uris, timeout=2)
+    tail = run('pool, capped hedge', pool)
+    for status in pool.status():
+        print(json.dumps(status))
+    print(f"hedged requests: {pool.hedged}")
+    print(f"p99 improvement over the single spiky node: {single / tail:.1f}x")
+    if tail >= single:
+        raise SystemExit('Hedging did not cut the tail latency')
+
+    for node in nodes:
+        node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Check the integer price path against the Decimal one, then time both.
+
+Every random snapshot (plain and weighted pools, including reserves well past 28
+digits and exact rounding ties) must price identically on both paths, and
+prices too large for the Decimal path to quantize must be declined by the
+integer path; any mismatch aborts the run. Run from the repository root with
+`python -m benchmarks.bench_price_math [samples]`.
+"""
+import random
+import sys
+import time
+from decimal import InvalidOperation
+
+from pricebot import fixedpoint
+from pricebot.chain import Snapshot
+from pricebot.pricebot import PriceBot
+
+RATIOS = (None, 20, 50, 70, 80, 98)
+
+
+def reference_bot(decimals, ratio):
+    # get_price only needs the token entry, so skip the Discord and chain setup
+    bot = object.__new__(PriceBot)
+    bot.token = {'decimals': decimals, 'ratio': ratio}
+    return bot
+
+
+def random_case(rng):
+    decimals = rng.choice((0, 6, 9, 18))
+    snapshot = Snapshot(
+        token_reserve=rng.randrange(1, 10 ** rng.randint(1, 40)),
+        bnb_reserve=rng.randrange(0, 10 ** rng.randint(1, 30)),
+        lp_supply=0,
+        bnb_lp_bnb=rng.randrange(1, 10 ** rng.randint(18, 27)),
+        bnb_lp_busd=rng.randrange(1, 10 ** rng.randint(18, 30)),
+    )
+    return snapshot, decimals, rng.choice(RATIOS)
+
+
+def tie_case(rng):
+    # bnb / token * busd / bnb_lp lands exactly on a half-way point of the 4th decimal
+    half = rng.randrange(10 ** 6) * 10 + 5
+    return Snapshot(token_reserve=10 ** 5 * 3, bnb_reserve=half * 3, lp_supply=0,
+                    bnb_lp_bnb=7 * 10 ** 18, bnb_lp_busd=7 * 10 ** 18), 18, None
+
+
+def fast_price(snapshot, decimals, ratio):
+    return fixedpoint.token_price(snapshot.bnb_reserve, snapshot.token_reserve, decimals,
+                                  snapshot.bnb_lp_busd, snapshot.bnb_lp_bnb, ratio)
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(13)
+    cases = [random_case(rng) for _ in range(samples)] + [tie_case(rng) for _ in range(samples // 100)]
+    bots = {(decimals, ratio): reference_bot(decimals, ratio) for _, decimals, ratio in cases}
+
+    declined = overflowed = 0
+    for snapshot, decimals, ratio in cases:
+        price = fast_price(snapshot, decimals, ratio)
+        try:
+            expected = bots[decimals, ratio].get_price(snapshot).quantize(PriceBot.display_precision)
+        except InvalidOperation:
+            # Past 28 digits; get_token_price raises here, so the tick is skipped
+            overflowed += 1
+            if price is not None:
+                raise SystemExit(f'Priced an unquantizable {snapshot} (decimals={decimals}, ratio={ratio}) at {price}')
+            continue
+
+        if price is None:
+            declined += 1
+        elif price != expected or str(price) != str(expected):
+            raise SystemExit(f'Mismatch for {snapshot} (decimals={decimals}, ratio={ratio}): {price} != {expected}')
+
+    print(f'{len(cases) - declined - overflowed} snapshots identical, {declined} deferred to the Decimal path, {overflowed} too large to quantize')
+
+    for ratio in (None, 70):
+        subset = [(snapshot, decimals) for snapshot, decimals, r in cases
+                  if r == ratio and fast_price(snapshot, 18, ratio) is not None][:20_000]
+        bot = reference_bot(18, ratio)
+
+        started = time.perf_counter()
+        for snapshot, _ in subset:
+            bot.get_price(snapshot).quantize(PriceBot.display_precision)
+        decimal_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for snapshot, _ in subset:
+            fast_price(snapshot, 18, ratio)
+        integer_seconds = time.perf_counter() - started
+
+        label = f'ratio={ratio}' if ratio else 'plain'
+        print(f'{label:<10} decimal {decimal_seconds / len(subset) * 1e6:7.2f} us'
+              f'   integer {integer_seconds / len(subset) * 1e6:7.2f} us'
+              f'   ({decimal_seconds / integer_seconds:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Round-trips per price tick: one call per read versus a batched ChainReader.
+
+Run from the repository root with `python -m benchmarks.bench_reads`.
+"""
+import time
+
+from web3 import Web3
+
+from benchmarks.mock_rpc import MockNode, random_address
+from pricebot.chain import ChainReader, MULTICALL_ADDRESS
+
+ERC20_ABI = [
+    {'name': 'balanceOf', 'type': 'function', 'stateMutability': 'view',
+     'inputs': [{'name': 'owner', 'type': 'address'}], 'outputs': [{'name': '', 'type': 'uint256'}]},
+    {'name': 'totalSupply', 'type': 'function', 'stateMutability': 'view',
+     'inputs': [], 'outputs': [{'name': '', 'type': 'uint256'}]},
+]
+
+TICKS = 50
+
+
+def setup_node(node):
+    addresses = {name: random_address(name) for name in ('bnb', 'busd', 'token', 'lp', 'bnb_lp')}
+    node.set_balance(addresses['token'], addresses['lp'], 1_000_000 * 10 ** 18)
+    node.set_balance(addresses['bnb'], addresses['lp'], 2_000 * 10 ** 18)
+    node.set_balance(addresses['bnb'], addresses['bnb_lp'], 500_000 * 10 ** 18)
+    node.set_balance(addresses['busd'], addresses['bnb_lp'], 150_000_000 * 10 ** 18)
+    node.set_supply(addresses['lp'], 40_000 * 10 ** 18)
+    return addresses
+
+
+def serial_tick(contracts, addresses):
+    # The per-tick reads made by get_price, get_bnb_price and generate_presence before batching
+    contracts['bnb'].functions.balanceOf(addresses['lp']).call()
+    contracts['token'].functions.balanceOf(addresses['lp']).call()
+    contracts['bnb'].functions.balanceOf(addresses['bnb_lp']).call()
+    contracts['busd'].functions.balanceOf(addresses['bnb_lp']).call()
+    contracts['lp'].functions.totalSupply().call()
+    contracts['token'].functions.balanceOf(addresses['lp']).call()
+    contracts['bnb'].functions.balanceOf(addresses['lp']).call()
+
+
+def batched_tick(reader, contracts, addresses):
+    reader.read({
+        'token_reserve': (contracts['token'], 'balanceOf', addresses['lp']),
+        'bnb_reserve': (contracts['bnb'], 'balanceOf', addresses['lp']),
+        'lp_supply': (contracts['lp'], 'totalSupply'),
+        'bnb_lp_bnb': (contracts['bnb'], 'balanceOf', addresses['bnb_lp']),
+        'bnb_lp_busd': (contracts['busd'], 'balanceOf', addresses['bnb_lp']),
+    })
+
+
+def run(label, node, tick):
+    node.reset_counters()
+    start = time.perf_counter()
+    for _ in range(TICKS):
+        # A new block every tick, as on BSC at a 3s refresh rate
+        node.block += 1
+        tick()
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<22} {node.round_trips / TICKS:>6.1f} round-trips/tick  {node.calls / TICKS:>6.1f} eth_calls/tick  {elapsed / TICKS * 1000:>8.2f} ms/tick")
+
+
+def main(latency=0.005):
+    for multicall in (True, False):
+        node = MockNode(latency=latency, multicall=multicall)
+        url = node.start()
+        web3 = Web3(Web3.HTTPProvider(url))
+        addresses = setup_node(node)
+        contracts = {name: web3.eth.contract(address=address, abi=ERC20_ABI) for name, address in addresses.items()}
+        reader = ChainReader(web3, MULTICALL_ADDRESS if multicall else None)
+
+        if multicall:
+            run('serial', node, lambda: serial_tick(contracts, addresses))
+        run('multicall' if multicall else 'json-rpc batch', node, lambda: batched_tick(reader, contracts, addresses))
+        node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Route graph discovery, reserve refresh and path pricing against a mock node.
+
+The token trades at $2 in a deep WBNB pool on one AMM, a thin and mispriced BUSD
+pool on another and a CAKE pool, so the deepest and liquidity-weighted prices
+can be compared. Run from the repository root with `python -m benchmarks.bench_routing`.
+"""
+import os
+import tempfile
+import time
+
+from web3 import Web3
+
+from benchmarks.mock_rpc import MockNode, random_address
+from pricebot.chain import ChainReader, MULTICALL_ADDRESS
+from pricebot.routing import BASES, PairGraph, load_route_graph
+
+RUNS = 1000
+E18 = 10 ** 18
+
+# (amm, base, token amount, base amount); BNB is $300 and CAKE $5
+POOLS = [
+    ('pancake', 'WBNB', 1_500_000, 10_000),  # Deep, $2
+    ('street', 'BUSD', 1_000, 2_500),  # Thin, $2.50
+    ('pancake', 'CAKE', 200_000, 80_000),  # $2
+]
+BASE_POOLS = [
+    ('pancake', 'WBNB', 'BUSD', 100_000, 30_000_000),
+    ('street', 'WBNB', 'BUSD', 1_000, 300_000),
+    ('pancake', 'CAKE', 'WBNB', 600_000, 10_000),
+    ('pancake', 'USDT', 'BUSD', 5_000_000, 5_000_000),
+]
+
+
+def add_pool(node, factories, amm, token_a, token_b, amount_a, amount_b):
+    pair = random_address(f'{amm}-{token_a}-{token_b}')
+    token0, token1 = sorted((token_a, token_b), key=str.lower)
+    node.set_factory_pair(factories[amm], token_a, token_b, pair)
+    node.set_pair(pair, token0, token1)
+    reserves = {token_a: amount_a * E18, token_b: amount_b * E18}
+    node.set_reserves(pair, reserves[token0], reserves[token1])
+
+
+def setup(node):
+    token = random_address('routed-token')
+    factories = {amm: random_address(f'{amm}-factory') for amm in ('pancake', 'street')}
+    for amm, base, token_amount, base_amount in POOLS:
+        add_pool(node, factories, amm, token, BASES[base], token_amount, base_amount)
+    for amm, base_a, base_b, amount_a, amount_b in BASE_POOLS:
+        add_pool(node, factories, amm, BASES[base_a], BASES[base_b], amount_a, amount_b)
+
+    return token, {amm: {'address': random_address(f'{amm}-lp'), 'factory': factory} for amm, factory in factories.items()}
+
+
+def main():
+    node = MockNode(latency=0.005)
+    chain = ChainReader(Web3(Web3.HTTPProvider(node.start())), MULTICALL_ADDRESS)
+    token, amms = setup(node)
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        os.mkdir('contracts')
+        for label in ('cold', 'warm'):
+            node.reset_counters()
+            started = time.perf_counter()
+            graph = load_route_graph(chain, token, amms)
+            print(f"{label} graph load   {(time.perf_counter() - started) * 1000:8.2f} ms  {node.round_trips} round-trips"
+                  f"  {len(graph['pairs'])} pairs")
+        os.chdir(cwd)
+
+    for mode in ('deepest', 'weighted'):
+        router = PairGraph(chain.web3, token, graph, mode)
+
+        node.reset_counters()
+        values, _ = chain.read(router.reads())
+        reserves = tuple(values.values())
+        refresh = node.round_trips
+
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            price, bnb_price = router.prices(reserves)
+        elapsed = (time.perf_counter() - started) / RUNS
+
+        print(f"{mode:<9} token ${price:.4f}  BNB ${bnb_price:.2f}  {refresh} round-trip refresh"
+              f"  {elapsed * 1e6:8.1f} us/price")
+
+    node.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Ticks the adaptive refresh scheduler spends on a simulated day, against a fixed rate.
+
+The price is flat most of the day with a few volatile hours, and commands arrive
+in bursts while it moves. Time is simulated, so this runs instantly. Run from
+the repository root with `python -m benchmarks.bench_scheduler`.
+"""
+import random
+from decimal import Decimal
+
+from pricebot.scheduler import RefreshScheduler
+
+DAY = 24 * 3600
+REFRESH_RATE = 15
+VOLATILE_HOURS = {9, 10, 14, 20}
+
+
+def simulate(scheduler, rng, fixed=False):
+    clock, ticks, busy_ticks = 0.0, 0, 0
+    price = Decimal('1.2345')
+    while clock < DAY:
+        volatile = int(clock // 3600) in VOLATILE_HOURS
+        if volatile:
+            price = (price * Decimal(1 + rng.gauss(0, 0.01))).quantize(Decimal('0.0001'))
+            for _ in range(rng.randint(0, 5)):
+                scheduler.note_command()
+            busy_ticks += 1
+        elif rng.random() < 0.02:
+            price = (price * Decimal(1 + rng.gauss(0, 0.0005))).quantize(Decimal('0.0001'))
+
+        scheduler.record(price)
+        ticks += 1
+        clock += REFRESH_RATE if fixed else scheduler.interval
+
+    return ticks, busy_ticks
+
+
+def main():
+    fixed, fixed_busy = simulate(RefreshScheduler('fixed', REFRESH_RATE), random.Random(16), fixed=True)
+    for minimum, maximum in ((15, 60), (5, 60), (5, 120)):
+        scheduler = RefreshScheduler('adaptive', REFRESH_RATE, minimum, maximum)
+        ticks, busy = simulate(scheduler, random.Random(16))
+        print(f"min {minimum:>3}s max {maximum:>3}s  {ticks:>6} ticks/day vs {fixed} fixed ({(1 - ticks / fixed) * 100:5.1f}% saved)"
+              f"  volatile hours: {busy} ticks vs {fixed_busy}")
+
+
+if __name__ == '__main__':
+    main()
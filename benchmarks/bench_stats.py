@@ -0,0 +1,60 @@
+"""Cost of the rolling price statistics per tick, against recomputing them from a list.
+
+Run from the repository root with `python -m benchmarks.bench_stats`.
+"""
+import math
+import random
+import time
+
+from pricebot.stats import WINDOWS, PriceStats
+
+TICKS = 20_000
+TICK = 15
+
+
+def naive_summary(ticks, seconds, now):
+    recent = [(timestamp, price) for timestamp, price in ticks if now - timestamp <= seconds]
+    held = [(later[0] - earlier[0], earlier[1]) for earlier, later in zip(recent, recent[1:])]
+    total = sum(span for span, _ in held)
+    returns = [math.log(later[1] / earlier[1]) for earlier, later in zip(recent, recent[1:])]
+    return {
+        'twap': sum(span * price for span, price in held) / total if total else recent[-1][1],
+        'high': max(price for _, price in recent),
+        'low': min(price for _, price in recent),
+        'volatility': math.sqrt(sum(r * r for r in returns)) * 100,
+    }
+
+
+def main():
+    rng = random.Random(18)
+    prices = [10.0]
+    for _ in range(TICKS - 1):
+        prices.append(prices[-1] * math.exp(rng.gauss(0, 0.002)))
+
+    stats = PriceStats()
+    now = time.time()
+    started = time.perf_counter()
+    for i, price in enumerate(prices):
+        stats.record(price, now + i * TICK)
+    record = (time.perf_counter() - started) / TICKS
+
+    end = now + (TICKS - 1) * TICK
+    started = time.perf_counter()
+    for _ in range(100):
+        summary = dict(stats.summary(end))
+    query = (time.perf_counter() - started) / 100
+
+    ticks = [(now + i * TICK, price) for i, price in enumerate(prices)]
+    started = time.perf_counter()
+    for _ in range(10):
+        naive = {seconds: naive_summary(ticks, seconds, end) for seconds in WINDOWS}
+    naive_query = (time.perf_counter() - started) / 10
+
+    print(f"record {record * 1e6:8.2f} us/tick   summary {query * 1e6:8.1f} us   recompute {naive_query * 1e6:10.1f} us")
+    for seconds in WINDOWS:
+        print(f"{seconds:>6}s  twap {summary[seconds]['twap']:.4f} (exact {naive[seconds]['twap']:.4f})"
+              f"  high {summary[seconds]['high']:.4f} ({naive[seconds]['high']:.4f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Compare two benchmark result files written by benchmarks.suite.
+
+Run from the repository root with `python -m benchmarks.compare old.json new.json`.
+Metrics that got more than `--threshold` percent worse are flagged.
+"""
+import argparse
+import json
+
+
+def load(filename):
+    with open(filename) as result_file:
+        return json.load(result_file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    print(f"{'metric':<36} {old['version']:>12} {new['version']:>12} {'change':>9}")
+
+    regressions = 0
+    for name in sorted(set(old['results']) | set(new['results'])):
+        before, after = old['results'].get(name), new['results'].get(name)
+        if before is None or after is None:
+            print(f"{name:<36} {before if before is not None else '-':>12} {after if after is not None else '-':>12}")
+            continue
+
+        change = (after - before) / before * 100 if before else 0
+        # Every metric is a cost (time, calls, memory), so an increase is a regression
+        flag = ' !' if change > args.threshold else ''
+        regressions += bool(flag)
+        print(f"{name:<36} {before:12.3f} {after:12.3f} {change:+8.1f}%{flag}")
+
+    if regressions:
+        raise SystemExit(f"{regressions} metric(s) regressed by more than {args.threshold}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import asyncio
+import contextlib
+
+from pricebot.pricebot import PriceBot
+
+
+class FakeMember:
+    def __init__(self, guild, latency):
+        self.guild = guild
+        self.latency = latency
+        self.nick = None
+
+    async def edit(self, nick=None):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.nick = nick
+        self.guild.edits += 1
+
+
+class FakeGuild:
+    """Just enough of discord.Guild for nickname updates, with a configurable edit latency."""
+
+    def __init__(self, guild_id, latency=0.0):
+        self.id = guild_id
+        self.me = FakeMember(self, latency)
+        self.edits = 0
+
+
+class FakeChannel:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content=None, embed=None, file=None):
+        self.sent.append(embed or file or content)
+
+
+class FakeContext:
+    def __init__(self, bot):
+        self.bot = bot
+        self.guild = None
+        self.channel = FakeChannel()
+
+    def typing(self):
+        return contextlib.nullcontext()
+
+
+class BenchBot(PriceBot):
+    """A PriceBot that never connects to Discord; guilds and presence are in-memory fakes."""
+
+    def __init__(self, config, token, guilds=()):
+        super().__init__(config, token)
+        self.fake_guilds = list(guilds)
+        self.presences = 0
+
+    @property
+    def guilds(self):
+        return self.fake_guilds
+
+    async def change_presence(self, *, activity=None, status=None, afk=False):
+        self.presences += 1
@@ -0,0 +1,169 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from eth_abi import decode_abi, encode_abi
+from web3 import Web3
+
+from pricebot.chain import MULTICALL_ADDRESS
+
+SELECTORS = {
+    '70a08231': 'balanceOf',
+    '18160ddd': 'totalSupply',
+    '313ce567': 'decimals',
+    '0dfe1681': 'token0',
+    'd21220a7': 'token1',
+    'e6a43905': 'getPair',
+    '0902f1ac': 'getReserves',
+    '252dba42': 'aggregate',
+}
+
+
+class MockNode:
+    """A tiny JSON-RPC stand-in for a BSC node.
+
+    Serves ERC20 balances and supplies, factory pairs and pair reserves from
+    in-memory tables, optionally answers
+    Multicall `aggregate`, and counts every HTTP round-trip and eth_call it sees.
+    `latency` may be a number of seconds or a callable returning one, and
+    `error_rate` is the share of requests answered with an HTTP 500, and
+    `fail_for` answers every request with one for a while, as an outage would.
+    """
+
+    def __init__(self, latency=0.0, multicall=True, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.multicall = multicall
+        self.balances = {}
+        self.supplies = {}
+        self.decimals = {}
+        self.pairs = {}
+        self.factory_pairs = {}
+        self.reserves = {}
+        self.block = 1
+        self.down_until = 0
+        self.round_trips = 0
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    def set_balance(self, token, holder, amount):
+        self.balances[(token.lower(), holder.lower())] = amount
+
+    def set_supply(self, token, amount):
+        self.supplies[token.lower()] = amount
+
+    def set_pair(self, lp, token0, token1):
+        self.pairs[lp.lower()] = (token0, token1)
+
+    def set_factory_pair(self, factory, token_a, token_b, pair):
+        self.factory_pairs[(factory.lower(), token_a.lower(), token_b.lower())] = pair
+        self.factory_pairs[(factory.lower(), token_b.lower(), token_a.lower())] = pair
+
+    def set_reserves(self, pair, reserve0, reserve1):
+        self.reserves[pair.lower()] = (reserve0, reserve1)
+
+    def fail_for(self, seconds):
+        self.down_until = time.monotonic() + seconds
+
+    def reset_counters(self):
+        with self.lock:
+            self.round_trips = 0
+            self.calls = 0
+
+    def call(self, to, data):
+        with self.lock:
+            self.calls += 1
+
+        data = data[2:] if data.startswith('0x') else data
+        fn = SELECTORS.get(data[:8])
+        args = bytes.fromhex(data[8:])
+        to = to.lower()
+
+        if fn == 'balanceOf':
+            holder = decode_abi(['address'], args)[0]
+            return encode_abi(['uint256'], [self.balances.get((to, holder.lower()), 0)])
+        if fn == 'totalSupply':
+            return encode_abi(['uint256'], [self.supplies.get(to, 0)])
+        if fn == 'decimals':
+            return encode_abi(['uint8'], [self.decimals.get(to, 18)])
+        if fn in ('token0', 'token1'):
+            return encode_abi(['address'], [self.pairs[to][fn == 'token1']])
+        if fn == 'getPair':
+            token_a, token_b = decode_abi(['address', 'address'], args)
+            pair = self.factory_pairs.get((to, token_a.lower(), token_b.lower()), '0x' + '00' * 20)
+            return encode_abi(['address'], [pair])
+        if fn == 'getReserves':
+            return encode_abi(['uint112', 'uint112', 'uint32'], [*self.reserves.get(to, (0, 0)), 0])
+        if fn == 'aggregate' and self.multicall and to == MULTICALL_ADDRESS.lower():
+            calls = decode_abi(['(address,bytes)[]'], args)[0]
+            results = [self.call(target, '0x' + call_data.hex()) for target, call_data in calls]
+            return encode_abi(['uint256', 'bytes[]'], [self.block, results])
+
+        raise ValueError(f'Unsupported call {data[:8]} to {to}')
+
+    def handle(self, request):
+        method, params = request['method'], request.get('params', [])
+        try:
+            if method == 'eth_call':
+                result = '0x' + self.call(params[0]['to'], params[0]['data']).hex()
+            elif method == 'eth_getCode':
+                deployed = self.multicall and params[0].lower() == MULTICALL_ADDRESS.lower()
+                result = '0x6080' if deployed else '0x'
+            elif method == 'eth_blockNumber':
+                result = hex(self.block)
+            elif method in ('eth_chainId', 'net_version'):
+                result = hex(56) if method == 'eth_chainId' else '56'
+            else:
+                raise ValueError(f'Unsupported method {method}')
+        except ValueError as e:
+            return {'jsonrpc': '2.0', 'id': request.get('id'), 'error': {'code': -32000, 'message': str(e)}}
+
+        return {'jsonrpc': '2.0', 'id': request.get('id'), 'result': result}
+
+    def start(self):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with node.lock:
+                    node.round_trips += 1
+                latency = node.latency() if callable(node.latency) else node.latency
+                if latency:
+                    time.sleep(latency)
+
+                if time.monotonic() < node.down_until or node.random.random() < node.error_rate:
+                    self.send_error(500)
+                    return
+
+                if isinstance(body, list):
+                    response = [node.handle(item) for item in body]
+                else:
+                    response = node.handle(body)
+
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def random_address(seed):
+    return Web3.toChecksumAddress('0x' + bytes(Web3.keccak(text=str(seed))[-20:]).hex())
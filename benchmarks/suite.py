@@ -0,0 +1,194 @@
+"""Hot-path benchmarks against a local mock BSC node and fake Discord guilds.
+
+Measures node round-trips per tick, tick wall time against the number of guilds,
+command latency, bursts of identical commands and memory per bot, then writes the results as JSON so runs can
+be compared with `python -m benchmarks.compare old.json new.json`.
+
+Run from the repository root with `python -m benchmarks.suite [output.json]`.
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.bench_reads import ERC20_ABI
+from benchmarks.fake_discord import BenchBot, FakeContext, FakeGuild
+from benchmarks.mock_rpc import MockNode, random_address
+from pricebot import dbwriter
+from pricebot.commands.price import Prices
+
+PAIR_ABI = ERC20_ABI + [
+    {'name': name, 'type': 'function', 'stateMutability': 'view', 'inputs': [], 'outputs': [{'name': '', 'type': 'address'}]}
+    for name in ('token0', 'token1')
+] + [{'name': 'decimals', 'type': 'function', 'stateMutability': 'view', 'inputs': [], 'outputs': [{'name': '', 'type': 'uint8'}]}]
+
+GUILD_COUNTS = (1, 10, 100, 500)
+EDIT_LATENCY = 0.005
+COMMAND_RUNS = 200
+BURST_SIZE = 500
+
+
+class Harness:
+    def __init__(self, node_latency=0.0):
+        self.node = MockNode(latency=node_latency)
+        self.url = self.node.start()
+        self.address = {name: random_address(name) for name in ('token', 'lp', 'bnb_lp')}
+        self.address['bnb'] = BenchBot.address['bnb']
+        self.address['busd'] = BenchBot.address['busd']
+
+        self.node.set_balance(self.address['token'], self.address['lp'], 1_000_000 * 10 ** 18)
+        self.node.set_balance(self.address['bnb'], self.address['lp'], 2_000 * 10 ** 18)
+        self.node.set_balance(self.address['bnb'], self.address['bnb_lp'], 500_000 * 10 ** 18)
+        self.node.set_balance(self.address['busd'], self.address['bnb_lp'], 150_000_000 * 10 ** 18)
+        self.node.set_supply(self.address['lp'], 40_000 * 10 ** 18)
+        self.node.set_pair(self.address['lp'], self.address['token'], self.address['bnb'])
+
+        os.makedirs('contracts', exist_ok=True)
+        for name, abi in (('token', ERC20_ABI + PAIR_ABI[-1:]), ('lp', PAIR_ABI)):
+            with open(f"contracts/{self.address[name]}.min.json", 'w') as abi_file:
+                json.dump(abi, abi_file)
+
+    def config(self):
+        return {
+            'amm': {'mock': {'address': self.address['bnb_lp'], 'name': 'MockSwap'}},
+            'bnb_emoji': ':bnb:',
+            'refresh_rate': 15,
+            'bsc_node': self.url,
+        }
+
+    def token(self):
+        return {'name': 'MOCK', 'contract': self.address['token'], 'lp': self.address['lp'], 'from': 'mock',
+                'icon': '🧪', 'emoji': None, 'apikey': ''}
+
+    def bot(self, guilds=()):
+        bot = BenchBot(self.config(), self.token(), guilds)
+        cog = Prices(bot)
+        bot.add_cog(cog)
+        return bot, cog
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50_ms': statistics.median(samples) * 1000,
+        'p95_ms': samples[int(len(samples) * 0.95)] * 1000,
+    }
+
+
+async def bench_ticks(harness, results):
+    bot, cog = harness.bot()
+
+    harness.node.reset_counters()
+    await cog.update_price()
+    results['tick.round_trips'] = harness.node.round_trips
+    results['tick.eth_calls'] = harness.node.calls
+
+    first_id = 0
+    for count in GUILD_COUNTS:
+        # Fresh guild ids, so no round waits out the previous round's nickname rate-limit buckets
+        bot.fake_guilds = [FakeGuild(i, EDIT_LATENCY) for i in range(first_id, first_id + count)]
+        first_id += count
+
+        started = time.perf_counter()
+        await cog.update_price()
+        results[f'tick.guilds_{count}.changed_ms'] = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        await cog.update_price()
+        results[f'tick.guilds_{count}.unchanged_ms'] = (time.perf_counter() - started) * 1000
+
+
+async def bench_commands(harness, results):
+    bot, cog = harness.bot()
+    await cog.update_price()
+
+    commands = {
+        'lp': (cog.lp, ('10',)),
+        'convert': (cog.convert, ('1000',)),
+        'ath': (cog.ath, ()),
+        'change': (cog.change, ('24h',)),
+        'range': (cog.price_range, ('24h',)),
+    }
+    for name, (command, args) in commands.items():
+        samples = []
+        for _ in range(COMMAND_RUNS):
+            ctx = FakeContext(bot)
+            started = time.perf_counter()
+            await command.callback(cog, ctx, *args)
+            samples.append(time.perf_counter() - started)
+
+        for stat, value in percentiles(samples).items():
+            results[f'command.{name}.{stat}'] = value
+
+
+async def bench_burst(harness, results):
+    """A pump: hundreds of identical `convert` and `lp` requests right after a new snapshot."""
+    bot, cog = harness.bot()
+    await cog.update_price()
+
+    for name, command, argument in (('convert', cog.convert, '1000'), ('lp', cog.lp, '10')):
+        cog.responses.invalidate()
+        misses = cog.responses.stats['misses']
+
+        started = time.perf_counter()
+        await asyncio.gather(*(command.callback(cog, FakeContext(bot), argument) for _ in range(BURST_SIZE)))
+        results[f'burst.{name}.total_ms'] = (time.perf_counter() - started) * 1000
+        results[f'burst.{name}.builds'] = cog.responses.stats['misses'] - misses
+
+
+def bench_memory(harness, results, bots=3):
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    created = [harness.bot() for _ in range(bots)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    results['memory.per_bot_kb'] = allocated / bots / 1024
+    return created
+
+
+def version():
+    try:
+        return subprocess.check_output(['git', 'describe', '--always', '--dirty'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main():
+    output = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else 'bench_output.json')
+    results = {}
+    cwd = os.getcwd()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        harness = Harness()
+        loop = asyncio.get_event_loop()
+
+        loop.run_until_complete(bench_ticks(harness, results))
+        loop.run_until_complete(bench_commands(harness, results))
+        loop.run_until_complete(bench_burst(harness, results))
+        bench_memory(harness, results)
+
+        for writer in dbwriter.writers.values():
+            writer.close()
+        harness.node.stop()
+        os.chdir(cwd)
+
+    report = {'version': version(), 'timestamp': int(time.time()), 'python': sys.version.split()[0], 'results': results}
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for name, value in results.items():
+        print(f"{name:<36} {value:12.3f}")
+    print(f"Results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,22 @@
+import asyncio
+import sys
+
+import yaml
+
+from pricebot import pricebot
+from pricebot.feed import FeedServer
+
+with open('config.yaml') as cfg_file:
+    cfg_defaults = yaml.safe_load(cfg_file)['_config']
+
+path = sys.argv[1] if len(sys.argv) > 1 else cfg_defaults.get('feed')
+if not path:
+    print(f"Usage: {sys.argv[0]} <socket path>  (or set `feed` in _config)")
+    sys.exit()
+
+server = FeedServer(pricebot.get_chain(cfg_defaults), path, cfg_defaults['refresh_rate'], pricebot.PriceBot.address)
+
+try:
+    asyncio.get_event_loop().run_until_complete(server.serve())
+except KeyboardInterrupt:
+    pass
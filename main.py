@@ -1,6 +1,7 @@
 import sys
 import importlib
 from pricebot import pricebot
+from pricebot.engine import run_bots
 import yaml
 
 bots = {}
@@ -11,24 +12,28 @@ with open('config.yaml') as cfg_file:
 cfg_defaults = cfg_data.pop('_config')
 
 if len(sys.argv) < 2:
-    print(f"Usage: {sys.argv[0]} <token>")
+    print(f"Usage: {sys.argv[0]} <token> [<token> ...] | --all")
     sys.exit()
 
-if sys.argv[1] and cfg_data.get(sys.argv[1]):
-    cfg_data = {sys.argv[1]: cfg_data.get(sys.argv[1])}
-else:
-    raise Exception(f"Token {sys.argv[1]} does not exist in configuration!")
+names = list(cfg_data) if sys.argv[1] == '--all' else sys.argv[1:]
+for name in names:
+    if not cfg_data.get(name):
+        raise Exception(f"Token {name} does not exist in configuration!")
+
+cfg_data = {name: cfg_data.get(name) for name in names}
 
+entries = {}
 for cfg_name, cfg_info in cfg_data.items():
     token = cfg_info.get('token')
     if not token:
         raise Exception(f"Each instance must have a token configuration")
 
     token['name'] = cfg_name
-    token['abi'] = pricebot.fetch_abi(token['contract'])
+    entries[cfg_name] = (token, {**cfg_defaults, **cfg_info.get('config', {})})
 
-    config = ({**cfg_defaults, **cfg_info.get('config', {})})
+pricebot.prepare_tokens(list(entries.values()))
 
+for cfg_name, (token, config) in entries.items():
     if config.get('plugin'):
         try:
             module = importlib.import_module(config['plugin'])
@@ -42,4 +47,7 @@ for cfg_name, cfg_info in cfg_data.items():
     else:
         bots[cfg_name] = pricebot.PriceBot(config, token)
 
-    bots[cfg_name].exec()
+if len(bots) == 1:
+    next(iter(bots.values())).exec()
+else:
+    run_bots(list(bots.values()), cfg_defaults['refresh_rate'])
@@ -0,0 +1,154 @@
+import time
+from dataclasses import dataclass
+
+from pricebot.events import BURN_TOPIC, MINT_TOPIC, SWAP_TOPIC, TRANSFER_TOPIC, as_int
+
+WBNB = '0xbb4cdb9cbd36b01bd1cbaebf2de08d9173bc095c'
+ZERO_ADDRESS = '0x' + '0' * 40
+
+
+def hexstr(value):
+    return value if isinstance(value, str) else value.hex()
+
+
+def words(data):
+    """Split the static 32-byte words of ABI-encoded log data into ints, without a full ABI decode."""
+    data = hexstr(data)
+    data = data[2:] if data.startswith('0x') else data
+    return [int(data[i:i + 64], 16) for i in range(0, len(data), 64)]
+
+
+def topic_address(topic):
+    return '0x' + hexstr(topic)[-40:].lower()
+
+
+@dataclass
+class Alert:
+    kind: str  # buy, sell, transfer, add or remove
+    usd: float
+    amount: float  # Whole tokens
+    block: int
+    tx: str
+
+
+class AlertPipeline:
+    """Turns the token's Transfer and the LP's Swap/Mint/Burn logs into USD-valued alerts.
+
+    Logs are read in block-range pages from the block after `checkpoint` up to the
+    head, at most `max_pages` per poll. A page the node refuses (too many results)
+    is halved and retried, and pages grow back after each success. Only topics
+    with a configured USD threshold are requested at all: `buy`, `sell`,
+    `transfer` and `liquidity` (LP adds and removes).
+    """
+
+    def __init__(self, source, token, lp, pair, decimals, thresholds, checkpoint=None, backfill=0, page=2000, max_pages=10):
+        self.source = source
+        self.token = token.lower()
+        self.lp = lp.lower()
+        self.token_first = pair[0].lower() == self.token
+        self.paired_with_bnb = {address.lower() for address in pair} == {self.token, WBNB}
+        self.scale = 10 ** decimals
+        self.thresholds = thresholds
+        self.checkpoint = checkpoint
+        self.backfill = backfill
+        self.page = self.max_page = page
+        self.max_pages = max_pages
+        self.logs_seen = 0
+
+        handlers = {
+            TRANSFER_TOPIC: (self.transfer, ('transfer',)),
+            SWAP_TOPIC: (self.swap, ('buy', 'sell')),
+            MINT_TOPIC: (self.liquidity, ('liquidity',)),
+            BURN_TOPIC: (self.liquidity, ('liquidity',)),
+        }
+        self.handlers = {topic: handler for topic, (handler, kinds) in handlers.items()
+                         if any(thresholds.get(kind) is not None for kind in kinds)}
+        self.addresses = [token] + ([lp] if set(self.handlers) - {TRANSFER_TOPIC} else [])
+
+    def fetch(self, from_block, to_block):
+        """Return the logs of one page and the last block it covered, shrinking the page on refusal."""
+        while True:
+            try:
+                return self.source.get_logs(self.addresses, [list(self.handlers)], from_block, to_block), to_block
+            except ValueError:
+                # web3 raises JSON-RPC error replies such as "query returned more than 10000 results" as
+                # ValueError; transport errors and an open circuit propagate without shrinking the page
+                if self.page <= 1:
+                    raise
+                self.page //= 2
+                to_block = min(to_block, from_block + self.page - 1)
+
+    def poll(self, price, bnb_price, head=None, deadline=None):
+        """Process pages up to the head; returns the alerts and whether the pipeline caught up.
+
+        No new page is started once `deadline` (a time.monotonic() value) has passed.
+        If a page fails after earlier pages found alerts, those are returned (not caught
+        up) and the failing page is retried on the next poll.
+        """
+        head = head if head is not None else self.source.block_number()
+        if self.checkpoint is None:
+            self.checkpoint = head - self.backfill
+
+        alerts = []
+        for _ in range(self.max_pages):
+            if self.checkpoint >= head or not self.handlers:
+                break
+            if deadline and time.monotonic() >= deadline:
+                break
+
+            start = self.checkpoint + 1
+            try:
+                logs, end = self.fetch(start, min(head, start + self.page - 1))
+            except Exception:
+                if not alerts:
+                    raise
+                # The checkpoint already covers the pages these came from, so hand them back now
+                return alerts, False
+
+            for log in logs:
+                if alert := self.handlers[hexstr(log['topics'][0])](log, price, bnb_price):
+                    alerts.append(alert)
+
+            self.logs_seen += len(logs)
+            self.checkpoint = end
+            self.page = min(self.page * 2, self.max_page)
+
+        return alerts, self.checkpoint >= head
+
+    def alert(self, kind, threshold, usd, amount, log):
+        # A Swap handler runs for buys and sells even when only one of them has a threshold
+        if self.thresholds.get(threshold) is None or usd < self.thresholds[threshold]:
+            return None
+
+        return Alert(kind, usd, amount, as_int(log['blockNumber']), hexstr(log['transactionHash']))
+
+    def transfer(self, log, price, bnb_price):
+        if log['address'].lower() != self.token:
+            # The LP token's own Transfers (staking into a farm, say) share the topic
+            return None
+
+        sender, receiver = topic_address(log['topics'][1]), topic_address(log['topics'][2])
+        if self.lp in (sender, receiver) or ZERO_ADDRESS in (sender, receiver):
+            # Trades and LP changes are reported from the pair's own events
+            return None
+
+        amount = words(log['data'])[0] / self.scale
+        return self.alert('transfer', 'transfer', amount * price, amount, log)
+
+    def swap(self, log, price, bnb_price):
+        amount0_in, amount1_in, amount0_out, amount1_out = words(log['data'])[:4]
+        token_in, token_out = (amount0_in, amount0_out) if self.token_first else (amount1_in, amount1_out)
+
+        amount = abs(token_out - token_in) / self.scale
+        kind = 'buy' if token_out > token_in else 'sell'
+        return self.alert(kind, kind, amount * price, amount, log)
+
+    def liquidity(self, log, price, bnb_price):
+        amount0, amount1 = words(log['data'])[:2]
+        token_amount, other_amount = (amount0, amount1) if self.token_first else (amount1, amount0)
+
+        amount = token_amount / self.scale
+        # Both sides of a V2 deposit are worth the same; BNB pairs can price theirs directly
+        other_usd = other_amount / 10 ** 18 * bnb_price if self.paired_with_bnb else amount * price
+        kind = 'add' if hexstr(log['topics'][0]) == MINT_TOPIC else 'remove'
+        return self.alert(kind, 'liquidity', amount * price + other_usd, amount, log)
@@ -0,0 +1,243 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+from web3._utils.request import make_post_request
+
+from pricebot.metrics import metrics
+
+# Multicall3 is deployed at the same address on BSC (and every other EVM chain)
+MULTICALL_ADDRESS = '0xcA11bde05977b3631167028862bE2a173976CA11'
+MULTICALL_ABI = [{
+    'name': 'aggregate',
+    'type': 'function',
+    'stateMutability': 'payable',
+    'inputs': [{
+        'name': 'calls',
+        'type': 'tuple[]',
+        'components': [{'name': 'target', 'type': 'address'}, {'name': 'callData', 'type': 'bytes'}],
+    }],
+    'outputs': [{'name': 'blockNumber', 'type': 'uint256'}, {'name': 'returnData', 'type': 'bytes[]'}],
+}]
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Every on-chain value a single price tick needs, read in one round-trip."""
+    token_reserve: int  # Raw token balance of the token LP
+    bnb_reserve: int  # WBNB balance of the token LP
+    lp_supply: int  # Total supply of the token LP
+    bnb_lp_bnb: int  # WBNB balance of the AMM's BNB/BUSD LP
+    bnb_lp_busd: int  # BUSD balance of the AMM's BNB/BUSD LP
+    block: Optional[int] = None
+    reserves: tuple = ()  # getReserves() of every pair in the token's route graph, when routing
+
+
+def checksum_addresses(types, values):
+    """Checksum decoded address outputs, as web3's own contract calls do; the raw codec returns them lowercase."""
+    return tuple(
+        Web3.toChecksumAddress(value) if kind == 'address'
+        else [Web3.toChecksumAddress(item) for item in value] if kind == 'address[]'
+        else value
+        for kind, value in zip(types, values)
+    )
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """Stops sending requests to a node that keeps failing.
+
+    After `threshold` consecutive failures the circuit opens and every call fails
+    fast with CircuitOpen for `backoff` seconds. Then a single trial call is let
+    through: a success closes the circuit, a failure opens it again for twice as
+    long, up to `max_backoff`.
+    """
+
+    def __init__(self, threshold=3, backoff=5, max_backoff=300):
+        self.threshold = threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.pause = 0
+        self.opened_until = 0
+        self.lock = threading.Lock()
+
+    def is_open(self):
+        return self.failures >= self.threshold
+
+    def check(self):
+        with self.lock:
+            if not self.is_open():
+                return
+
+            now = time.monotonic()
+            if now < self.opened_until:
+                metrics.inc('circuit_rejected_total')
+                raise CircuitOpen(f"Node circuit open for another {self.opened_until - now:.1f}s")
+
+            # Half-open: this call is the trial, everyone else keeps failing fast until it reports back
+            self.opened_until = now + self.pause
+
+    def success(self):
+        with self.lock:
+            if self.is_open():
+                metrics.inc('circuit_closed_total')
+            self.failures = 0
+            self.pause = 0
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.is_open():
+                self.pause = min(self.max_backoff, self.pause * 2 if self.pause else self.backoff)
+                self.opened_until = time.monotonic() + self.pause
+                metrics.inc('circuit_opened_total')
+
+
+class ChainReader:
+    """Collects contract reads and sends them to the node as few requests as possible.
+
+    Reads go through Multicall's `aggregate` when it is deployed, otherwise as a
+    single JSON-RPC batch over HTTP. IPC providers fall back to one call per read.
+    Async callers use `read_async`, which runs the blocking web3 calls on a bounded
+    thread pool so a slow node never stalls the Discord event loop. Requests that
+    reach the node go through a CircuitBreaker, so a failing node isn't hammered.
+
+    Every read is pinned to a single block, which is returned with the values, so a
+    snapshot never mixes reserves from different blocks. Commands read from the
+    tick's snapshot rather than the node.
+    """
+
+    def __init__(self, web3, multicall=MULTICALL_ADDRESS, workers=4, timeout=10, breaker=None):
+        self.web3 = web3
+        self.breaker = breaker or CircuitBreaker()
+        self.round_trips = 0
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='chain')
+        self.multicall = None
+
+        if multicall:
+            multicall = Web3.toChecksumAddress(multicall)
+            if self.web3.eth.getCode(multicall):
+                self.multicall = self.web3.eth.contract(address=multicall, abi=MULTICALL_ABI)
+
+    def read(self, reads, block='latest'):
+        """Execute a dict of name -> (contract, fn_name, *args) reads at one block.
+
+        Identical reads under different names are only sent once. Returns the decoded
+        values keyed by name, and the block number they were read at.
+        """
+        decoded = {}
+        calls = {}
+        for name, (contract, fn_name, *args) in reads.items():
+            key = (contract.address, fn_name, tuple(args))
+            if key in decoded or key in calls:
+                continue
+
+            fn = contract.get_function_by_name(fn_name)
+            calls[key] = (contract.address, contract.encodeABI(fn_name=fn_name, args=args), get_abi_output_types(fn.abi))
+
+        if calls:
+            keys = list(calls)
+            if self.multicall:
+                with metrics.timer('rpc_seconds', method='multicall'):
+                    block, raw = self.guarded(self._read_multicall, [calls[k] for k in keys], block)
+            elif hasattr(self.web3.provider, 'post') or hasattr(self.web3.provider, 'endpoint_uri'):
+                with metrics.timer('rpc_seconds', method='batch'):
+                    block, raw = self.guarded(self._read_batch, [calls[k] for k in keys], block)
+            else:
+                with metrics.timer('rpc_seconds', method='serial'):
+                    block, raw = self.guarded(self._read_serial, [calls[k] for k in keys], block)
+
+            for key, data in zip(keys, raw):
+                value = checksum_addresses(calls[key][2], self.web3.codec.decode_abi(calls[key][2], data))
+                decoded[key] = value[0] if len(value) == 1 else value
+
+        values = {name: decoded[(contract.address, fn_name, tuple(args))] for name, (contract, fn_name, *args) in reads.items()}
+        return values, block
+
+    def guarded(self, fn, *args):
+        """Call the node I/O in `fn` unless the circuit is open, recording whether the node answered.
+
+        Only transport failures (connection errors, timeouts, HTTP errors) count
+        against the node; anything else, such as a JSON-RPC error reply, propagates
+        without touching the breaker.
+        """
+        self.breaker.check()
+        try:
+            result = fn(*args)
+        except OSError:
+            self.breaker.failure()
+            raise
+
+        self.breaker.success()
+        return result
+
+    async def read_async(self, reads, block='latest', timeout=None):
+        return await self.run(self.read, reads, block, timeout=timeout)
+
+    async def run(self, fn, *args, timeout=None):
+        """Run a blocking chain call on the executor, giving up after `timeout` seconds."""
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(self.executor, fn, *args), timeout or self.timeout)
+
+    def _read_multicall(self, calls, block):
+        self.round_trips += 1
+        block_number, raw = self.multicall.functions.aggregate(
+            [(address, Web3.toBytes(hexstr=data)) for address, data, _ in calls]
+        ).call(block_identifier=block)
+        return block_number, raw
+
+    def _read_batch(self, calls, block):
+        block_param = hex(block) if isinstance(block, int) else block
+        payload = [
+            {'jsonrpc': '2.0', 'id': i, 'method': 'eth_call', 'params': [{'to': address, 'data': data}, block_param]}
+            for i, (address, data, _) in enumerate(calls)
+        ]
+        if block == 'latest':
+            # Report the block in the same batch rather than pinning it with a round-trip of its own
+            payload.append({'jsonrpc': '2.0', 'id': 'block', 'method': 'eth_blockNumber', 'params': []})
+
+        self.round_trips += 1
+        response = json.loads(self._post(json.dumps(payload).encode()))
+        if not isinstance(response, list):
+            raise ValueError(f"Node rejected batch request: {response.get('error')}")
+
+        results = {}
+        for item in response:
+            if 'error' in item:
+                raise ValueError(f"eth_call failed: {item['error']}")
+            results[item['id']] = item['result']
+
+        if block == 'latest':
+            block = int(results['block'], 16)
+        return block, [Web3.toBytes(hexstr=results[i]) for i in range(len(calls))]
+
+    def _post(self, data):
+        provider = self.web3.provider
+        if hasattr(provider, 'post'):
+            return provider.post(data)
+
+        return make_post_request(provider.endpoint_uri, data, **provider.get_request_kwargs())
+
+    def _read_serial(self, calls, block):
+        if block == 'latest':
+            # One call per read, so pin them all to the head up front
+            self.round_trips += 1
+            block = self.web3.eth.blockNumber
+
+        raw = []
+        for address, data, _ in calls:
+            self.round_trips += 1
+            raw.append(bytes(self.web3.eth.call({'to': address, 'data': data}, block)))
+
+        return block, raw
@@ -0,0 +1,114 @@
+import asyncio
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from pricebot.responses import ResponseCache
+
+BACKGROUND = (0x2F, 0x31, 0x36)
+GRID = (0x40, 0x44, 0x4B)
+UP = (0x98, 0xFB, 0x98)
+DOWN = (0xE0, 0x66, 0x66)
+
+pools = {}
+
+
+def get_pool(workers=2):
+    """Return the process pool charts are rendered in, shared by every bot in this process."""
+    if workers not in pools:
+        pools[workers] = ProcessPoolExecutor(max_workers=workers)
+
+    return pools[workers]
+
+
+def encode_png(width, height, pixels):
+    """Encode packed 8-bit RGB pixels as a PNG, using only zlib."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    stride = width * 3
+    raw = b''.join(b'\x00' + bytes(pixels[y * stride:(y + 1) * stride]) for y in range(height))
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw, 6))
+            + chunk(b'IEND', b''))
+
+
+def merge_candles(candles, columns):
+    """Merge consecutive (bucket, open, high, low, close) rows down to at most `columns` candles."""
+    if len(candles) <= columns:
+        return candles
+
+    merged = []
+    for i in range(columns):
+        group = candles[i * len(candles) // columns:(i + 1) * len(candles) // columns]
+        merged.append((group[0][0], group[0][1], max(c[2] for c in group), min(c[3] for c in group), group[-1][4]))
+
+    return merged
+
+
+def render_candles(candles, width=640, height=320, padding=12):
+    """Render OHLC rows as a candlestick PNG; runs in a worker process."""
+    pixels = bytearray(bytes(BACKGROUND) * width * height)
+
+    def fill(x0, y0, x1, y1, color):
+        span = bytes(color) * (x1 - x0)
+        for y in range(max(y0, 0), min(y1, height)):
+            start = (y * width + x0) * 3
+            pixels[start:start + len(span)] = span
+
+    plot_width, plot_height = width - 2 * padding, height - 2 * padding
+    candles = merge_candles(candles, max(plot_width // 3, 1))
+    low, high = min(c[3] for c in candles), max(c[2] for c in candles)
+    if high == low:
+        low, high = low * 0.99 or -1, high * 1.01 or 1
+
+    def y_of(price):
+        return padding + int((high - price) / (high - low) * (plot_height - 1))
+
+    for i in range(5):
+        y = padding + i * (plot_height - 1) // 4
+        fill(padding, y, width - padding, y + 1, GRID)
+
+    column = plot_width / len(candles)
+    body = max(1, int(column * 0.7))
+    for i, (_, open_price, high_price, low_price, close_price) in enumerate(candles):
+        color = UP if close_price >= open_price else DOWN
+        left = padding + int(i * column + (column - body) / 2)
+        center = left + body // 2
+        fill(center, y_of(high_price), center + 1, y_of(low_price) + 1, color)
+        top, bottom = sorted((y_of(open_price), y_of(close_price)))
+        fill(left, top, left + body, bottom + 1, color)
+
+    return encode_png(width, height, pixels)
+
+
+class ChartRenderer:
+    """Candlestick charts of a token's PriceHistory, cached until the current bucket closes.
+
+    A chart is keyed by (window, start of the open bucket), so every request
+    within one bucket shares a single render, and identical requests arriving
+    during a render wait for it. Rendering runs in a process pool, away from the
+    event loop and the price loop.
+    """
+
+    def __init__(self, history, workers=2):
+        self.history = history
+        self.workers = workers
+        self.cache = ResponseCache(maxsize=32)
+
+    async def render(self, window, now=None):
+        """Return the PNG for the last `window` seconds, or None without history."""
+        now = int(now or time.time())
+        resolution = self.history.resolution_for(window)
+
+        async def build():
+            candles = self.history.candles(window, now, resolution)
+            if not candles:
+                return None
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(get_pool(self.workers), render_candles, candles)
+
+        return await self.cache.get('chart', (window, now - now % resolution), build)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+from functools import partial
+
+import discord
+from discord.ext import commands
+from pricebot.alerts import AlertPipeline
+from pricebot.commands.models import alerts
+from pricebot.events import NodeLogSource
+
+ALERT_TITLES = {
+    'buy': ('Buy', discord.Color.green()),
+    'sell': ('Sell', discord.Color.red()),
+    'transfer': ('Whale Transfer', discord.Color.blue()),
+    'add': ('Liquidity Added', discord.Color.green()),
+    'remove': ('Liquidity Removed', discord.Color.red()),
+}
+LINES_PER_EMBED = 20
+POLL_DEADLINE = 30  # Seconds after which a poll stops starting new pages
+POLL_TIMEOUT = 60
+
+class Alerts(commands.Cog, command_attrs=dict(hidden=True)):
+    task = None
+    polling = None
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.db = bot.db
+        self.config = bot.config.get('alerts') or {}
+        self.pipeline = None
+        if not self.config.get('channels'):
+            return
+
+        alerts.Base.metadata.create_all(self.bot.dbengine)
+        checkpoint = None
+        query = self.db.query(alerts.AlertCheckpoint).filter(alerts.AlertCheckpoint.token == self.bot.token['contract'])
+        if result := query.first():
+            self.db.expunge(result)
+            self.db.rollback()
+            checkpoint = result.block
+
+        thresholds = {kind: self.config.get(kind) for kind in ('buy', 'sell', 'transfer', 'liquidity')}
+        if self.bot.weighted_pool:
+            # Weighted pools don't emit V2 Swap/Mint/Burn events
+            thresholds = {'transfer': thresholds['transfer']}
+
+        self.pipeline = AlertPipeline(
+            NodeLogSource(self.bot.chain), self.bot.token['contract'], self.bot.token['lp'], self.bot.pair_info,
+            self.bot.token['decimals'], thresholds, checkpoint=checkpoint,
+            backfill=self.config.get('backfill', 0), page=self.config.get('page', 2000)
+        )
+
+    def cog_unload(self):
+        if self.task:
+            self.task.cancel()
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        if self.pipeline and not self.task:
+            self.task = self.bot.loop.create_task(self.run())
+
+    async def run(self):
+        token = self.bot.token['name']
+        while True:
+            caught_up = True
+            if self.polling or (self.bot.current_price and self.bot.bnb_price):
+                if not self.polling:
+                    poll = partial(self.pipeline.poll, float(self.bot.current_price), float(self.bot.bnb_price),
+                                   deadline=time.monotonic() + POLL_DEADLINE)
+                    self.polling = self.bot.loop.run_in_executor(self.bot.chain.executor, poll)
+
+                try:
+                    # Shielded, so a poll still running at the timeout is awaited again instead of started twice
+                    found, caught_up = await asyncio.wait_for(asyncio.shield(self.polling), POLL_TIMEOUT)
+                except asyncio.TimeoutError:
+                    print(f"{token} alert poll still running after {POLL_TIMEOUT}s.")
+                except Exception as e:
+                    self.polling = None
+                    print(f"{token} alert poll failed.", repr(e))
+                else:
+                    self.polling = None
+                    self.save_checkpoint()
+                    if found:
+                        await self.post(found)
+
+            # Keep going without a pause while a backfill is still behind the head
+            await asyncio.sleep(0 if not caught_up else self.config.get('poll_rate', 15))
+
+    def save_checkpoint(self):
+        self.bot.writer.submit(
+            alerts.AlertCheckpoint.upsert(self.bot.token['contract'], self.pipeline.checkpoint),
+            key=('alert_checkpoint', self.bot.token['contract'])
+        )
+
+    def format_alert(self, alert):
+        amount = f"{alert.amount:,.2f}"
+        return f"**${alert.usd:,.2f}** · {self.bot.icon_value(amount)} · {self.bot.bscscan_link(alert.tx, 'tx', 'tx')}"
+
+    async def post(self, found):
+        embeds = []
+        for kind, (title, color) in ALERT_TITLES.items():
+            lines = [self.format_alert(alert) for alert in found if alert.kind == kind]
+            for start in range(0, len(lines), LINES_PER_EMBED):
+                embeds.append(discord.Embed(color=color, title=f"{self.bot.get_icon()} {title}",
+                                            description='\n'.join(lines[start:start + LINES_PER_EMBED])))
+
+        for channel_id in self.config['channels']:
+            channel = self.bot.get_channel(channel_id)
+            if not channel:
+                continue
+
+            for embed in embeds:
+                try:
+                    await channel.send(embed=embed)
+                except discord.HTTPException as e:
+                    print(f"Failed to post {self.bot.token['name']} alerts to {channel_id}.", e)
+                    break
+
+def setup(bot: commands.Bot):
+    bot.add_cog(Alerts(bot))
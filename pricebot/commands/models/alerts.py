@@ -0,0 +1,26 @@
+from sqlalchemy import *  # Column, Integer, String
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+Base = declarative_base()
+
+class AlertCheckpoint(Base):
+    __tablename__ = 'alert_checkpoint'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    token = Column(String, nullable=False, unique=True)
+    block = Column(Integer, nullable=False)  # Last block whose logs were fully processed
+
+    def __repr__(self):
+        return f"<Alert checkpoint for {str(self.token)} at block {self.block}>"
+
+    @staticmethod
+    def upsert(token, block):
+        """A DBWriter mutation storing the alert checkpoint for `token`."""
+        def write(session):
+            statement = sqlite_insert(AlertCheckpoint).values(token=token, block=block)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['token'], set_={'block': statement.excluded.block}
+            ))
+
+        return write
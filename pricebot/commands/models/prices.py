@@ -1,6 +1,7 @@
 from sqlalchemy import *  # func, Table, Column, Boolean, BigInteger, Binary, DateTime, Integer, Float, String
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 Base = declarative_base()
 
@@ -14,3 +15,42 @@ class PriceATH(Base):
 
     def __repr__(self):
         return f"<ATH of {self.price} for {str(self.token)} at {self.timestamp}>"
+
+    @staticmethod
+    def upsert(token, price, timestamp):
+        """A DBWriter mutation storing the ATH for `token`."""
+        def write(session):
+            statement = sqlite_insert(PriceATH).values(token=token, price=price, timestamp=timestamp)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=['token'], set_={'price': statement.excluded.price, 'timestamp': statement.excluded.timestamp}
+            ))
+
+        return write
+
+class PriceTick(Base):
+    __tablename__ = 'price_tick'
+    __table_args__ = (Index('ix_price_tick_token_timestamp', 'token', 'timestamp'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    token = Column(String, nullable=False)
+    timestamp = Column(Integer, nullable=False)  # Unix seconds
+    price = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<Tick of {self.price} for {str(self.token)} at {self.timestamp}>"
+
+class PriceRollup(Base):
+    __tablename__ = 'price_rollup'
+    __table_args__ = (UniqueConstraint('token', 'resolution', 'bucket', name='uq_price_rollup_bucket'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    token = Column(String, nullable=False)
+    resolution = Column(Integer, nullable=False)  # Bucket width in seconds
+    bucket = Column(Integer, nullable=False)  # Unix seconds at the start of the bucket
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<{self.resolution}s OHLC {self.open}/{self.high}/{self.low}/{self.close} for {str(self.token)} at {self.bucket}>"
@@ -1,5 +1,8 @@
 from discord.ext import commands
 
+from pricebot.metrics import metrics
+from pricebot.scheduler import budget, schedulers
+
 class Owner(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -45,5 +48,56 @@ class Owner(commands.Cog):
         else:
             await ctx.message.add_reaction('👍')
 
+    @commands.command(name='chainstats', hidden=True)
+    @commands.is_owner()
+    async def owner_chain_stats(self, ctx):
+        """Shows node round-trips and the current snapshot's block."""
+
+        block = self.bot.snapshot.block if self.bot.snapshot else 'none'
+        await ctx.send(f'Block {block} | {self.bot.chain.round_trips} round-trips')
+
+    @commands.command(name='metrics', hidden=True)
+    @commands.is_owner()
+    async def owner_metrics(self, ctx, *, name: str = ''):
+        """Shows recent timer percentiles and counters.
+        Optionally filtered by metric name, e.g. metrics rpc"""
+
+        if not metrics.enabled:
+            return await ctx.send('Metrics are disabled; set `metrics: true` in the configuration.')
+
+        lines = []
+        for timer, labels, count, values in metrics.percentiles():
+            if name in timer:
+                label_text = ' '.join(f'{key}={value}' for key, value in labels.items())
+                quantiles = ' '.join(f'p{int(q * 100)}={value * 1000:.1f}ms' for q, value in values.items())
+                lines.append(f'{timer} {label_text} n={count} {quantiles}')
+
+        # Executor threads add counters while this runs, so copy them under the lock as render() does
+        with metrics.lock:
+            counters = sorted(metrics.counters.items())
+        for (counter, labels), value in counters:
+            if name in counter:
+                lines.append(f"{counter} {' '.join(f'{key}={label}' for key, label in labels)} {value}")
+
+        output = '\n'.join(lines) or 'No metrics recorded yet'
+        await ctx.send(f'```{output[:1900]}```')
+
+    @commands.command(name='schedule', hidden=True)
+    @commands.is_owner()
+    async def owner_schedule(self, ctx):
+        """Shows each token's adaptive refresh interval and the ticks it saved."""
+
+        lines = [
+            f'{scheduler.name}: every {scheduler.interval:.1f}s ({scheduler.minimum:g}-{scheduler.maximum:g}s) | '
+            f'{scheduler.effective_rate():.1f} ticks/min vs {60 / scheduler.base:.1f} fixed | '
+            f'{scheduler.savings() * 100:.0f}% saved'
+            for scheduler in schedulers
+        ]
+        if budget.limit:
+            lines.append(f'Budget {budget.limit} ticks/min | {budget.waited:.0f}s spent waiting')
+
+        output = '\n'.join(lines) or 'No tokens scheduled'
+        await ctx.send(f'```{output[:1900]}```')
+
 def setup(bot):
     bot.add_cog(Owner(bot))
@@ -1,13 +1,23 @@
+import asyncio
+import io
 import math
 from datetime import datetime
 
 import discord
-from discord.ext import tasks, commands
+from discord.ext import commands
 from decimal import Decimal, DecimalException
+from pricebot.chart import ChartRenderer
 from pricebot.commands.models import prices
+from pricebot.history import PriceHistory, parse_window
+from pricebot.metrics import metrics
+from pricebot.responses import ResponseCache
+from pricebot.stats import WINDOWS, PriceStats, format_window
+
+STALE_CHECK = 30
 
 class Prices(commands.Cog, command_attrs=dict(hidden=True)):
     current_ath = None
+    stale_task = None
 
     def __init__(self, bot):
         self.bot = bot
@@ -16,47 +26,162 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
         prices.Base.metadata.create_all(self.bot.dbengine)
         query = self.db.query(prices.PriceATH).filter(prices.PriceATH.token == self.bot.token['contract'])
         if result := query.first():
+            # Detached, so the read session never holds pending writes; updates go through the DB writer
+            self.db.expunge(result)
+            self.db.rollback()
             self.current_ath = result
 
+        self.history = PriceHistory(self.bot.dbengine, self.bot.writer, self.bot.token['contract'],
+                                    batch_size=self.bot.config.get('history_batch', 20))
+        self.bot.writer.close_hooks.append(self.history.flush)
+        self.responses = ResponseCache()
+        self.charts = ChartRenderer(self.history, workers=self.bot.config.get('chart_workers', 2))
+
+        # TWAP can stand in for the spot price where one large swap shouldn't show up
+        self.twap_window = parse_window(self.bot.config.get('twap_window'))
+        self.twap_for = set(self.bot.config.get('twap_for', ())) if self.twap_window else set()
+        self.rolling = PriceStats(WINDOWS + ((self.twap_window,) if self.twap_window else ()))
+        self.twap = None
+
+    def cog_unload(self):
+        if self.stale_task:
+            self.stale_task.cancel()
+        self.bot.writer.close_hooks.remove(self.history.flush)
+        self.history.flush()
+
+    def save_ath(self):
+        self.bot.writer.submit(
+            prices.PriceATH.upsert(self.current_ath.token, float(self.current_ath.price), self.current_ath.timestamp),
+            key=('ath', self.current_ath.token)
+        )
+
     @commands.Cog.listener()
     async def on_ready(self):
-        await self.update_price()
+        if not self.stale_task:
+            self.stale_task = self.bot.loop.create_task(self.watch_staleness())
+
+        if self.bot.engine or self.bot.priceloop:
+            # Snapshots arrive from the shared PriceEngine through on_snapshot, or the loop survived a reconnect
+            return
+
+        tick = self.poll_events if self.bot.sync_watcher else self.update_price
+        self.bot.priceloop = self.bot.loop.create_task(self.bot.scheduler.run(tick))
+
+    @commands.Cog.listener()
+    async def on_snapshot(self, snapshot):
+        await self.update_price(snapshot)
+
+    @commands.Cog.listener()
+    async def on_command(self, ctx):
+        self.bot.scheduler.note_command()
+
+    async def poll_events(self):
+        token = self.bot.token['name']
+        try:
+            snapshot = await self.bot.fetch_event_snapshot()
+        except Exception as e:
+            self.skip_tick(token, e)
+            return
 
-        self.bot.priceloop = tasks.loop(seconds=self.bot.config['refresh_rate'])(self.update_price)
-        self.bot.priceloop.add_exception_type(discord.errors.HTTPException)
-        self.bot.priceloop.start()
+        if snapshot:
+            await self.update_price(snapshot)
+        elif self.bot.current_price:
+            # No trades since the last poll
+            self.bot.scheduler.record(self.bot.current_price)
 
-    async def update_price(self):
+    async def update_price(self, snapshot=None):
+        token = self.bot.token['name']
+        with metrics.timer('tick_seconds', token=token):
+            await self.run_tick(snapshot, token)
+
+    async def run_tick(self, snapshot, token):
         try:
-            self.bot.current_price = self.bot.get_token_price()
-        except Exception:
+            with metrics.timer('tick_phase_seconds', token=token, phase='fetch'):
+                snapshot = snapshot or await self.bot.fetch_snapshot_async()
+                self.bot.current_price = self.bot.get_token_price(snapshot)
+        except Exception as e:
             # Ignore issues with blockchain timeouts, but don't update anything
+            self.skip_tick(token, e)
             return
 
-        for guild in self.bot.guilds:
-            await guild.me.edit(nick=self.bot.generate_nickname())
+        self.bot.scheduler.record(self.bot.current_price)
+        self.rolling.record(self.bot.current_price)
+        if self.twap_window:
+            self.twap = Decimal(self.rolling.twap(self.twap_window)).quantize(self.bot.display_precision)
 
+        # Everything derived from the snapshot (ATH included) is updated before the first
+        # await, so no command can be answered and cached from a half-updated snapshot
+        presence = self.bot.generate_presence(self.price_for('presence'))
+        ath_price = self.price_for('ath')
         if self.current_ath:
-            if self.bot.current_price > self.current_ath.price:
-                try:
-                    self.current_ath.price = self.bot.current_price
-                    self.current_ath.timestamp = datetime.utcnow()
-
-                    self.db.update(self.current_ath)
-                    self.db.commit()
-                    return await self.bot.change_presence(activity=discord.Game(name='ATH Hit!'))
-                except Exception:
-                    pass
+            if ath_price > self.current_ath.price:
+                self.current_ath.price = ath_price
+                self.current_ath.timestamp = datetime.utcnow()
+                self.save_ath()
+                presence = 'ATH Hit!'
         else:
-            ath = prices.PriceATH(token=self.bot.token['contract'], price=self.bot.current_price)
-            self.db.add(ath)
-            self.db.commit()
-
-            self.current_ath = ath
+            self.current_ath = prices.PriceATH(token=self.bot.token['contract'], price=ath_price,
+                                               timestamp=datetime.utcnow())
+            self.save_ath()
+        self.responses.invalidate()
 
-        presence = self.bot.generate_presence()
-        if presence:
-            await self.bot.change_presence(activity=discord.Game(name=presence))
+        try:
+            with metrics.timer('tick_phase_seconds', token=token, phase='history'):
+                self.history.record(self.bot.current_price)
+        except Exception as e:
+            print(f"Failed to record {token} price history.", e)
+
+        self.bot.nickname = self.bot.generate_nickname(self.price_for('nickname'))
+        with metrics.timer('tick_phase_seconds', token=token, phase='nickname'):
+            await self.bot.edits.update_nicknames(self.bot.nickname)
+        if self.bot.config.get('debug'):
+            print(f"{token} tick: {self.bot.edits.stats}")
+
+        with metrics.timer('tick_phase_seconds', token=token, phase='presence'):
+            if presence:
+                await self.bot.edits.update_presence(presence)
+
+        await self.precompute(token)
+
+    def skip_tick(self, token, error):
+        metrics.inc('ticks_skipped_total', token=token, reason=type(error).__name__)
+        if self.bot.config.get('debug'):
+            print(f"{token} tick skipped.", repr(error))
+
+    async def watch_staleness(self):
+        """Mark the nickname and presence stale while no good snapshot arrives, whatever the price source."""
+        while True:
+            await asyncio.sleep(STALE_CHECK)
+            if not self.bot.current_price or not (age := self.bot.stale_age()):
+                continue
+
+            # Embeds pick up the age on their next build
+            self.responses.invalidate()
+            self.bot.nickname = self.bot.generate_nickname(self.price_for('nickname'))
+            try:
+                await self.bot.edits.update_nicknames(self.bot.nickname)
+                await self.bot.edits.update_presence(f"Stale price: no update for {age}")
+            except Exception as e:
+                print(f"{self.bot.token['name']} stale marking failed.", e)
+
+    def stale_note(self):
+        age = self.bot.stale_age()
+        return f" | ⚠ price {age} old" if age else ''
+
+    def price_for(self, use):
+        """The TWAP when `twap_for` lists `use` (nickname, presence or ath), otherwise the spot price."""
+        return self.twap if use in self.twap_for else self.bot.current_price
+
+    async def precompute(self, token):
+        """Build the argument-less command responses for the new snapshot ahead of any request."""
+        try:
+            with metrics.timer('tick_phase_seconds', token=token, phase='precompute'):
+                await self.lp_response(Decimal(1))
+                await self.convert_response(Decimal(1))
+                await self.ath_response()
+        except Exception as e:
+            if self.bot.config.get('debug'):
+                print(f"{token} responses not precomputed.", repr(e))
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
@@ -75,16 +200,29 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
         num_tokens = abs(self.bot.parse_decimal(num_tokens) or 1)
 
         with ctx.typing():
-            total_supply = self.bot.total_supply
-            values = [Decimal(self.bot.token_amount / total_supply), Decimal(self.bot.bnb_amount / total_supply)]
+            embed = await self.lp_response(num_tokens)
+        if not embed:
+            return await ctx.channel.send('No LP supply to value yet')
 
-            bnb_emoji = self.bot.config['bnb_emoji']
+        await ctx.channel.send(embed=embed)
+
+    async def lp_response(self, num_tokens):
+        # Keyed on the text, since the header echoes the amount as typed
+        return await self.responses.get('lp', str(num_tokens), lambda: self.build_lp(num_tokens))
+
+    async def build_lp(self, num_tokens):
+        if not (values := await self.bot.get_lp_value()):
+            return None
+
+        values = [Decimal(value) for value in values]
 
-            token_value = str(round(values[0] * num_tokens, 5))
-            bnb_value = str(round(values[1] * num_tokens, 5))
+        bnb_emoji = self.bot.config['bnb_emoji']
+
+        token_value = str(round(values[0] * num_tokens, 5))
+        bnb_value = str(round(values[1] * num_tokens, 5))
 
-            output_header = f"{format(num_tokens, '.12g')} {self.bot.token['name']}/BNB LP"
-            output_body = f"{self.bot.icon_value(token_value)} + {bnb_emoji} {bnb_value}"
+        output_header = f"{format(num_tokens, '.12g')} {self.bot.token['name']}/BNB LP"
+        output_body = f"{self.bot.icon_value(token_value)} + {bnb_emoji} {bnb_value}"
 
         embed = discord.Embed(color=0x98FB98, title=output_header, description=output_body)
 
@@ -93,14 +231,27 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
         if amm_info.get('name'):
             footer_text += f" | via {amm_info.get('name')}"
 
-        embed.set_footer(text=footer_text)
+        embed.set_footer(text=footer_text + self.stale_note())
 
-        await ctx.channel.send(embed=embed)
+        return embed
 
     @commands.command(help='Display BNB value of tokens')
     async def convert(self, ctx: commands.Context, num_tokens=None):
         num_tokens = self.bot.parse_decimal(num_tokens) or Decimal(1)
 
+        if not (embed := await self.convert_response(num_tokens)):
+            return await ctx.channel.send('No price available yet')
+
+        await ctx.channel.send(embed=embed)
+
+    async def convert_response(self, num_tokens):
+        # Decimals hash by value, so 1000, 1000.0 and 1e3 share an entry (and a response)
+        return await self.responses.get('convert', num_tokens, lambda: self.build_convert(num_tokens))
+
+    async def build_convert(self, num_tokens):
+        if not self.bot.current_price or not self.bot.bnb_price:
+            return None
+
         total_price = num_tokens * self.bot.current_price
         price_in_bnb = total_price / self.bot.bnb_price
 
@@ -114,6 +265,87 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
         embed = discord.Embed(color=0x3D85C6, title=token_emoji + ' ' + output_header,
                               description=f"{output_body} _(${usd})_")
 
+        amm_info = self.bot.get_amm()
+        footer_text = f"via {amm_info.get('name')}" if amm_info.get('name') else ''
+        if footer_text := (footer_text + self.stale_note()).lstrip(' |'):
+            embed.set_footer(text=footer_text)
+
+        return embed
+
+    @commands.command(help='Display price change over a window, e.g. 1h, 24h or 7d')
+    async def change(self, ctx: commands.Context, window='24h'):
+        seconds = parse_window(window)
+        if not seconds:
+            return await ctx.channel.send('Windows look like 30m, 24h or 7d')
+
+        if not (result := self.history.change(seconds)):
+            return await ctx.channel.send('No price history recorded yet')
+
+        start, end = result
+        percent = (end - start) / start * 100 if start else 0
+
+        output_body = f"**{percent:+.2f}%** (${start:.4f} → ${end:.4f})"
+        embed = discord.Embed(color=0x98FB98 if percent >= 0 else 0xE06666,
+                              title=f"{self.bot.icon_value()} {window} change", description=output_body)
+
+        amm_info = self.bot.get_amm()
+        if amm_info.get('name'):
+            embed.set_footer(text=f"via {amm_info.get('name')}")
+
+        await ctx.channel.send(embed=embed)
+
+    @commands.command(name='range', help='Display the low and high price over a window, e.g. 1h, 24h or 7d')
+    async def price_range(self, ctx: commands.Context, window='24h'):
+        seconds = parse_window(window)
+        if not seconds:
+            return await ctx.channel.send('Windows look like 30m, 24h or 7d')
+
+        if not (result := self.history.range(seconds)):
+            return await ctx.channel.send('No price history recorded yet')
+
+        low, high = result
+        output_body = f"Low **${low:.4f}** | High **${high:.4f}**"
+        embed = discord.Embed(color=0x3D85C6, title=f"{self.bot.icon_value()} {window} range", description=output_body)
+
+        amm_info = self.bot.get_amm()
+        if amm_info.get('name'):
+            embed.set_footer(text=f"via {amm_info.get('name')}")
+
+        await ctx.channel.send(embed=embed)
+
+    @commands.command(help='Display a price chart over a window, e.g. 1h, 24h or 7d')
+    async def chart(self, ctx: commands.Context, window='24h'):
+        seconds = parse_window(window)
+        if not seconds:
+            return await ctx.channel.send('Windows look like 30m, 24h or 7d')
+
+        with ctx.typing():
+            png = await self.charts.render(seconds)
+        if not png:
+            return await ctx.channel.send('No price history recorded yet')
+
+        embed = discord.Embed(color=0x3D85C6, title=f"{self.bot.icon_value()} {window} chart")
+        embed.set_image(url='attachment://chart.png')
+
+        amm_info = self.bot.get_amm()
+        if amm_info.get('name'):
+            embed.set_footer(text=f"via {amm_info.get('name')}")
+
+        await ctx.channel.send(file=discord.File(io.BytesIO(png), filename='chart.png'), embed=embed)
+
+    @commands.command(name='stats', help='Display TWAP, range, change and volatility over recent windows')
+    async def price_stats(self, ctx: commands.Context):
+        # Served from the in-memory rolling windows; no node or database access
+        lines = [
+            f"**{format_window(seconds)}** TWAP ${stats['twap']:.4f} | {stats['change']:+.2f}% | "
+            f"${stats['low']:.4f} - ${stats['high']:.4f} | vol {stats['volatility']:.2f}%"
+            for seconds, stats in self.rolling.summary()
+        ]
+        if not lines:
+            return await ctx.channel.send('No prices recorded yet')
+
+        embed = discord.Embed(color=0x3D85C6, title=f"{self.bot.icon_value()} stats", description='\n'.join(lines))
+
         amm_info = self.bot.get_amm()
         if amm_info.get('name'):
             embed.set_footer(text=f"via {amm_info.get('name')}")
@@ -122,6 +354,13 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
 
     @commands.command()
     async def ath(self, ctx: commands.Context):
+        if embed := await self.ath_response():
+            await ctx.channel.send(embed=embed)
+
+    async def ath_response(self):
+        return await self.responses.get('ath', None, self.build_ath)
+
+    async def build_ath(self):
         token_emoji = self.bot.icon_value()
         if not self.current_ath:
             return
@@ -136,7 +375,7 @@ class Prices(commands.Cog, command_attrs=dict(hidden=True)):
         if amm_info.get('name'):
             embed.set_footer(text=f"Recorded {time} via {amm_info.get('name')}")
 
-        await ctx.channel.send(embed=embed)
+        return embed
 
 def setup(bot: commands.Bot):
     bot.add_cog(Prices(bot))
@@ -0,0 +1,103 @@
+import threading
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from pricebot.metrics import metrics
+
+writers = {}
+
+
+def create_db_engine(url, echo=False):
+    """Create an SQLite engine in WAL mode, so readers never wait on the writer thread."""
+    engine = create_engine(url, echo=echo, connect_args={'check_same_thread': False, 'timeout': 30})
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.close()
+
+    return engine
+
+
+def get_writer(url, echo=False):
+    """Return the DBWriter for `url`, shared by every bot in this process."""
+    if url not in writers:
+        writers[url] = DBWriter(create_db_engine(url, echo))
+
+    return writers[url]
+
+
+class DBWriter:
+    """Applies queued database mutations in batches from a background thread.
+
+    A mutation is a callable taking a Session. Mutations submitted with a `key`
+    replace any still-queued mutation with the same key, so only the latest ATH
+    per token is written. Everything queued is committed together every `interval`.
+    """
+
+    def __init__(self, engine, interval=1.0):
+        self.engine = engine
+        self.interval = interval
+        self.session = sessionmaker(bind=engine)
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.closed = False
+        self.close_hooks = []
+        self.thread = threading.Thread(target=self.run, name='dbwriter', daemon=True)
+        self.thread.start()
+
+    def submit(self, mutation, key=None):
+        with self.lock:
+            self.pending[key if key is not None else object()] = mutation
+            self.idle.clear()
+
+    def run(self):
+        while not self.closed or self.pending:
+            self.wakeup.wait(self.interval)
+            self.wakeup.clear()
+
+            with self.lock:
+                batch, self.pending = list(self.pending.values()), {}
+
+            if batch:
+                self.commit(batch)
+
+            with self.lock:
+                if not self.pending:
+                    self.idle.set()
+
+    def commit(self, batch):
+        session = self.session()
+        try:
+            with metrics.timer('db_commit_seconds'):
+                for mutation in batch:
+                    mutation(session)
+                session.commit()
+            metrics.inc('db_mutations_total', len(batch))
+        except Exception as e:
+            session.rollback()
+            print(f'Failed to write {len(batch)} queued database changes.', e)
+        finally:
+            session.close()
+
+    def flush(self, timeout=None):
+        """Write everything queued so far, waiting up to `timeout` seconds."""
+        self.wakeup.set()
+        return self.idle.wait(timeout)
+
+    def close(self, timeout=30):
+        if self.closed:
+            return
+
+        for hook in self.close_hooks:
+            hook()
+
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join(timeout)
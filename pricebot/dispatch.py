@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import deque
+
+import discord
+
+from pricebot.metrics import metrics
+
+# Per-route limits as (requests, seconds); kept under the buckets Discord reports for these routes
+ROUTE_LIMITS = {
+    'nick': (1, 1.0),  # PATCH /guilds/{guild_id}/members/@me/nick, per guild
+    'presence': (5, 60.0),  # Gateway presence updates, per connection
+}
+
+
+class RouteBuckets:
+    """Sliding-window limiter keyed by (route, major parameter)."""
+
+    def __init__(self, limits=ROUTE_LIMITS):
+        self.limits = limits
+        self.history = {}
+        self.blocked_until = {}
+
+    def delay(self, route, key):
+        now = time.monotonic()
+        limit, per = self.limits[route]
+        history = self.history.setdefault((route, key), deque())
+        while history and now - history[0] >= per:
+            history.popleft()
+
+        wait = self.blocked_until.get((route, key), 0) - now
+        if len(history) >= limit:
+            wait = max(wait, per - (now - history[0]))
+
+        return max(wait, 0)
+
+    async def acquire(self, route, key):
+        while wait := self.delay(route, key):
+            await asyncio.sleep(wait)
+
+        self.history[(route, key)].append(time.monotonic())
+
+    def block(self, route, key, retry_after):
+        self.blocked_until[(route, key)] = time.monotonic() + retry_after
+
+
+class EditDispatcher:
+    """Sends nickname and presence updates without wasting Discord requests.
+
+    Unchanged values are skipped per guild, guilds are edited concurrently under a
+    semaphore, and while an edit is waiting on its rate-limit bucket any newer value
+    replaces the pending one, so only the latest price is ever sent.
+    """
+
+    def __init__(self, bot, concurrency=5):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.semaphore = None
+        self.buckets = RouteBuckets()
+        self.sent = {}
+        self.pending = {}
+        self.workers = {}
+        self.stats = {'tick_duration': 0.0, 'edits': 0, 'skipped': 0, 'coalesced': 0, 'rate_limited': 0}
+
+    async def update_nicknames(self, nickname, timeout=None):
+        """Queue `nickname` for every guild and wait up to `timeout` seconds for the edits."""
+        started = time.monotonic()
+        tasks = []
+        for guild in self.bot.guilds:
+            key = ('nick', guild.id)
+            tasks.append(self.queue(key, nickname, lambda value, guild=guild: guild.me.edit(nick=value)))
+
+        await self.wait([task for task in tasks if task], timeout)
+        self.stats['tick_duration'] = time.monotonic() - started
+
+    async def update_presence(self, name):
+        task = self.queue(('presence', None), name, lambda value: self.bot.change_presence(activity=discord.Game(name=value)))
+        await self.wait([task] if task else [])
+
+    def queue(self, key, value, send):
+        if self.pending.get(key, self.sent.get(key)) == value:
+            self.stats['skipped'] += 1
+            metrics.inc('discord_edits_skipped_total', route=key[0])
+            return None
+
+        if key in self.pending:
+            self.stats['coalesced'] += 1
+        self.pending[key] = value
+
+        worker = self.workers.get(key)
+        if not worker or worker.done():
+            worker = self.workers[key] = asyncio.ensure_future(self.send_latest(key, send))
+
+        return worker
+
+    async def wait(self, tasks, timeout=None):
+        if tasks:
+            # Edits still waiting on a bucket keep running, and will pick up newer values
+            await asyncio.wait(tasks, timeout=timeout or self.bot.config['refresh_rate'])
+
+    async def send_latest(self, key, send):
+        if not self.semaphore:
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        route, major = key
+        while key in self.pending:
+            await self.buckets.acquire(route, major)
+            value = self.pending.pop(key, None)
+            if value is None or value == self.sent.get(key):
+                continue
+
+            async with self.semaphore:
+                try:
+                    with metrics.timer('discord_edit_seconds', route=route):
+                        await send(value)
+                except discord.errors.HTTPException as e:
+                    if e.status == 429:
+                        self.stats['rate_limited'] += 1
+                        metrics.inc('discord_rate_limited_total', route=route)
+                        self.buckets.block(route, major, float(e.response.headers.get('Retry-After', 1)))
+                        self.pending.setdefault(key, value)
+                    else:
+                        print(f'Failed to update {route} for {major}.', e)
+                    continue
+
+            self.sent[key] = value
+            self.stats['edits'] += 1
+
+    def forget(self, guild_id):
+        self.sent.pop(('nick', guild_id), None)
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from pricebot.chain import CircuitOpen
+from pricebot.metrics import metrics
+from pricebot.scheduler import budget, schedulers
+
+
+class PriceEngine:
+    """Polls the chain once per tick on behalf of every bot sharing a node.
+
+    Each registered bot contributes its `snapshot_reads`; the ChainReader sends
+    reads of the same contract/function/args (the BNB/BUSD LP, shared token LPs)
+    only once. The resulting snapshots are dispatched to each bot as `on_snapshot`.
+    A bot is due once its scheduler's current interval has passed.
+    """
+
+    def __init__(self, chain, refresh_rate):
+        self.chain = chain
+        self.refresh_rate = refresh_rate
+        self.bots = []
+        self.last_update = {}
+        self.task = None
+
+    def register(self, bot):
+        """Add a bot to the shared tick, unless its reads fail on their own.
+
+        One failing read fails the whole shared read, so a bot whose reads fail at
+        start-up polls alone instead, and only its own ticks are skipped.
+        """
+        try:
+            bot.chain.read(bot.snapshot_reads())
+        except Exception as e:
+            print(f"{bot.token['name']}'s reads failed; polling it separately from the price engine.", repr(e))
+            return
+
+        if bot.sync_watcher:
+            print(f"{bot.token['name']} shares a price engine with other tokens; polling balances instead of Sync events.")
+            bot.sync_watcher = None
+            # Back to refresh_rate, in case event_poll_rate set a faster one
+            schedulers.remove(bot.scheduler)
+            bot.scheduler = bot.make_scheduler()
+
+        bot.engine = self
+        self.bots.append(bot)
+        self.refresh_rate = min(self.refresh_rate, bot.config['refresh_rate'])
+
+    def due_bots(self, now):
+        return [
+            bot for bot in self.bots
+            if bot.is_ready() and now - self.last_update.get(bot, 0) >= bot.scheduler.interval
+        ]
+
+    def next_due(self, now):
+        if not self.bots:
+            return self.refresh_rate
+
+        return min(self.last_update.get(bot, 0) + bot.scheduler.interval for bot in self.bots) - now
+
+    async def tick(self):
+        now = time.monotonic()
+        bots = self.due_bots(now)
+        if not bots:
+            return
+
+        await budget.acquire()
+
+        reads = {}
+        for i, bot in enumerate(bots):
+            for name, read in bot.snapshot_reads().items():
+                reads[(i, name)] = read
+
+        values, block = await self.chain.read_async(reads)
+
+        bot_values = [{} for _ in bots]
+        for (i, name), value in values.items():
+            bot_values[i][name] = value
+
+        for bot, fields in zip(bots, bot_values):
+            self.last_update[bot] = now
+            bot.dispatch('snapshot', bot.build_snapshot(fields, block))
+
+    async def run(self):
+        while True:
+            try:
+                with metrics.timer('engine_tick_seconds'):
+                    await self.tick()
+            except Exception as e:
+                # Keep polling through node timeouts; each bot keeps its last price
+                metrics.inc('ticks_skipped_total', token='engine', reason=type(e).__name__)
+                if not isinstance(e, CircuitOpen):
+                    print('Price engine tick failed.', e)
+
+            # Never spin faster than once a second, even while a bot isn't ready yet
+            await asyncio.sleep(max(1, self.next_due(time.monotonic())))
+
+    def start(self, loop):
+        if not self.task:
+            self.task = loop.create_task(self.run())
+
+
+def run_bots(bots, refresh_rate):
+    """Run every bot on one event loop, with one PriceEngine per distinct node.
+
+    Bots left without an engine (see PriceEngine.register) start their own price loop.
+    """
+    engines = {}
+    for bot in bots:
+        bot.load_cogs()
+        if bot.engine:
+            # Subscribed to a feed process already
+            continue
+
+        if bot.chain not in engines:
+            engines[bot.chain] = PriceEngine(bot.chain, refresh_rate)
+        engines[bot.chain].register(bot)
+
+    loop = asyncio.get_event_loop()
+    for engine in engines.values():
+        engine.start(loop)
+
+    try:
+        loop.run_until_complete(asyncio.gather(*(bot.start(bot.token['apikey']) for bot in bots)))
+    except KeyboardInterrupt:
+        loop.run_until_complete(asyncio.gather(*(bot.close() for bot in bots)))
+    finally:
+        loop.close()
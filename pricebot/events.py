@@ -0,0 +1,96 @@
+import json
+from bisect import bisect_left, bisect_right
+
+from eth_abi import decode_abi
+from web3 import Web3
+
+SYNC_TOPIC = Web3.keccak(text='Sync(uint112,uint112)').hex()
+TRANSFER_TOPIC = Web3.keccak(text='Transfer(address,address,uint256)').hex()
+SWAP_TOPIC = Web3.keccak(text='Swap(address,uint256,uint256,uint256,uint256,address)').hex()
+MINT_TOPIC = Web3.keccak(text='Mint(address,uint256,uint256)').hex()
+BURN_TOPIC = Web3.keccak(text='Burn(address,uint256,uint256,address)').hex()
+
+
+def pair_fields(address_a, address_b, field_a, field_b):
+    """Order two snapshot fields as (reserve0, reserve1); V2 pairs sort token0 below token1."""
+    if int(address_a, 16) < int(address_b, 16):
+        return field_a, field_b
+    return field_b, field_a
+
+
+def as_int(value):
+    return int(value, 16) if isinstance(value, str) else value
+
+
+class NodeLogSource:
+    def __init__(self, chain):
+        self.chain = chain
+        self.web3 = chain.web3
+
+    def block_number(self):
+        return self.chain.guarded(lambda: self.web3.eth.blockNumber)
+
+    def get_logs(self, addresses, topics, from_block, to_block='latest'):
+        log_filter = {'address': addresses, 'topics': topics, 'fromBlock': from_block, 'toBlock': to_block}
+        return self.chain.guarded(self.web3.eth.getLogs, log_filter)
+
+
+class ReplayLogSource:
+    """Serves recorded `eth_getLogs` output, up to a head block the caller advances."""
+
+    def __init__(self, logs, head=0):
+        self.logs = sorted(logs, key=lambda log: (as_int(log['blockNumber']), as_int(log['logIndex'])))
+        self.blocks = [as_int(log['blockNumber']) for log in self.logs]
+        self.head = head
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, filename, head=0):
+        with open(filename) as log_file:
+            return cls(json.load(log_file), head)
+
+    def block_number(self):
+        self.calls += 1
+        return self.head
+
+    def get_logs(self, addresses, topics, from_block, to_block='latest'):
+        self.calls += 1
+        addresses = {address.lower() for address in addresses}
+        to_block = self.head if to_block == 'latest' else to_block
+        # Only topic0 is filtered on; a nested list matches any of its topics, as eth_getLogs does
+        wanted = set(topics[0]) if isinstance(topics[0], (list, tuple)) else {topics[0]}
+        return [
+            log for log in self.logs[bisect_left(self.blocks, from_block):bisect_right(self.blocks, to_block)]
+            if log['address'].lower() in addresses and log['topics'][0] in wanted
+        ]
+
+
+class SyncWatcher:
+    """Tracks pair reserves from their `Sync` events.
+
+    `pairs` maps each LP address to the two snapshot fields its reserve0 and
+    reserve1 update. Every poll is a single `eth_getLogs` from the block after the
+    last one seen up to latest; a full resync restarts it from the snapshot's block.
+    """
+
+    def __init__(self, source, pairs):
+        self.source = source
+        self.pairs = {address.lower(): fields for address, fields in pairs.items()}
+        self.addresses = list(pairs)
+        self.last_block = None
+
+    def start(self, block=None):
+        self.last_block = block
+
+    def poll(self):
+        if self.last_block is None:
+            self.last_block = self.source.block_number()
+
+        updates = {}
+        for log in self.source.get_logs(self.addresses, [SYNC_TOPIC], self.last_block + 1):
+            data = log['data']
+            reserves = decode_abi(['uint112', 'uint112'], Web3.toBytes(hexstr=data) if isinstance(data, str) else bytes(data))
+            updates.update(zip(self.pairs[log['address'].lower()], reserves))
+            self.last_block = max(self.last_block, as_int(log['blockNumber']))
+
+        return updates, self.last_block
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import asdict
+
+from web3 import Web3
+
+from pricebot.chain import Snapshot
+from pricebot.metrics import metrics
+
+# Everything a snapshot reads is an ERC20 call, LP tokens included
+ERC20_ABI = [
+    {'name': 'balanceOf', 'type': 'function', 'stateMutability': 'view',
+     'inputs': [{'name': 'account', 'type': 'address'}], 'outputs': [{'name': '', 'type': 'uint256'}]},
+    {'name': 'totalSupply', 'type': 'function', 'stateMutability': 'view',
+     'inputs': [], 'outputs': [{'name': '', 'type': 'uint256'}]},
+]
+MAX_BUFFER = 64 * 1024  # Subscribers this far behind are dropped rather than buffered for
+
+
+def encode(snapshot):
+    return json.dumps(asdict(snapshot), separators=(',', ':')).encode() + b'\n'
+
+
+def decode(line):
+    return Snapshot(**json.loads(line))
+
+
+class FeedServer:
+    """Polls the chain once per tick for every process subscribed over a Unix socket.
+
+    A subscriber sends one JSON line naming its token, LP and AMM pair, then
+    receives a compact JSON snapshot per tick; a new subscriber gets the latest
+    snapshot straight away. A new subscription is read once on its own first, and
+    refused if that fails. Subscriptions to the same pairs share their reads,
+    and the ChainReader sends each distinct read once, so node load follows the
+    number of distinct pairs rather than the number of bot processes.
+    """
+
+    def __init__(self, chain, path, refresh_rate, address):
+        self.chain = chain
+        self.path = path
+        self.refresh_rate = refresh_rate
+        self.address = address
+        self.contracts = {}
+        self.subscribers = {}
+        self.latest = {}
+
+    def contract(self, address):
+        if address not in self.contracts:
+            self.contracts[address] = self.chain.web3.eth.contract(address=Web3.toChecksumAddress(address), abi=ERC20_ABI)
+        return self.contracts[address]
+
+    def snapshot_reads(self, subscription):
+        token, lp, amm = subscription
+        bnb, busd = self.contract(self.address['bnb']), self.contract(self.address['busd'])
+        return {
+            'token_reserve': (self.contract(token), 'balanceOf', lp),
+            'bnb_reserve': (bnb, 'balanceOf', lp),
+            'lp_supply': (self.contract(lp), 'totalSupply'),
+            'bnb_lp_bnb': (bnb, 'balanceOf', amm),
+            'bnb_lp_busd': (busd, 'balanceOf', amm),
+        }
+
+    async def handle(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            subscription = tuple(Web3.toChecksumAddress(request[field]) for field in ('token', 'lp', 'amm'))
+        except (ValueError, KeyError, TypeError):
+            writer.close()
+            return
+
+        if subscription not in self.subscribers:
+            try:
+                # Every subscription shares one read per tick, so a token or LP that isn't an ERC20
+                # would fail the tick for every process; try it on its own first
+                values, block = await self.chain.read_async(self.snapshot_reads(subscription))
+            except Exception as e:
+                print(f"Refused feed subscription for {subscription[0]}; its reads failed.", repr(e))
+                metrics.inc('feed_subscriptions_refused_total')
+                writer.close()
+                return
+            self.latest.setdefault(subscription, encode(Snapshot(block=block, **values)))
+
+        self.subscribers.setdefault(subscription, set()).add(writer)
+        metrics.inc('feed_subscriptions_total')
+        writer.write(self.latest[subscription])
+
+        try:
+            # Subscribers never send anything else; this returns when they disconnect
+            await reader.read()
+        except ConnectionError:
+            pass
+        finally:
+            writers = self.subscribers.get(subscription, set())
+            writers.discard(writer)
+            if not writers:
+                self.subscribers.pop(subscription, None)
+                self.latest.pop(subscription, None)
+            writer.close()
+
+    async def tick(self):
+        subscriptions = list(self.subscribers)
+        if not subscriptions:
+            return
+
+        reads = {}
+        for i, subscription in enumerate(subscriptions):
+            for name, read in self.snapshot_reads(subscription).items():
+                reads[(i, name)] = read
+
+        values, block = await self.chain.read_async(reads)
+
+        fields = [{} for _ in subscriptions]
+        for (i, name), value in values.items():
+            fields[i][name] = value
+
+        for subscription, snapshot in zip(subscriptions, fields):
+            if subscription not in self.subscribers:
+                continue
+
+            line = self.latest[subscription] = encode(Snapshot(block=block, **snapshot))
+            for writer in list(self.subscribers.get(subscription, ())):
+                if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+                    writer.close()
+                else:
+                    writer.write(line)
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                with metrics.timer('feed_tick_seconds'):
+                    await self.tick()
+            except Exception as e:
+                # Keep polling through node timeouts; subscribers keep their last snapshot
+                metrics.inc('ticks_skipped_total', token='feed', reason=type(e).__name__)
+                print('Price feed tick failed.', e)
+
+            await asyncio.sleep(max(0, self.refresh_rate - (time.monotonic() - started)))
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        server = await asyncio.start_unix_server(self.handle, path=self.path)
+        print(f"Price feed listening on {self.path}")
+        async with server:
+            await self.run()
+
+
+class FeedSubscriber:
+    """Stands in for the PriceEngine, dispatching snapshots read from a FeedServer."""
+
+    def __init__(self, bot, path, retry=5):
+        self.bot = bot
+        self.path = path
+        self.retry = retry
+        self.task = None
+
+    def subscription(self):
+        request = {'token': self.bot.token['contract'], 'lp': self.bot.token['lp'], 'amm': self.bot.amm['address']}
+        return json.dumps(request).encode() + b'\n'
+
+    def start(self, loop):
+        if not self.task:
+            self.task = loop.create_task(self.run())
+
+    async def run(self):
+        connected = True
+        while True:
+            writer = None
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                writer.write(self.subscription())
+                await writer.drain()
+                connected = True
+
+                while line := await reader.readline():
+                    self.bot.dispatch('snapshot', decode(line))
+            except (OSError, ValueError, TypeError) as e:
+                # A feed dying mid-write leaves a partial line that doesn't decode; reconnect either way.
+                # Only report the first failure; the bot keeps its last price while retrying
+                if connected:
+                    print(f"{self.bot.token['name']} lost the price feed at {self.path}.", repr(e))
+                connected = False
+            finally:
+                if writer:
+                    writer.close()
+
+            await asyncio.sleep(self.retry)
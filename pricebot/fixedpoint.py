@@ -0,0 +1,55 @@
+from decimal import Decimal
+from fractions import Fraction
+from functools import lru_cache
+
+# Decimal's default context rounds each operation to 28 significant digits. The
+# Decimal price formula chains at most seven such operations, so its result is
+# within 7 * 0.5e-27 (relative) of the exact value; ERROR_BOUND is a generous cap.
+ERROR_BOUND = 10 ** 25  # 1e-25 relative
+PLACES = 4
+PRECISION = 28  # Decimal's default precision; quantize() raises past it
+
+
+def token_price(bnb_reserve, token_reserve, decimals, busd_reserve, bnb_lp_reserve, ratio=None):
+    """Price the token from raw reserves in integer arithmetic, rounded to 4 places.
+
+    Returns the same Decimal that the Decimal formula in PriceBot.get_price
+    quantizes to, or None when the exact price lies so close to a rounding
+    boundary that Decimal's intermediate rounding could tip it the other way
+    (or when the inputs need the Decimal path, e.g. empty reserves, or a price
+    too large for Decimal to quantize at all).
+    """
+    if decimals > 18:
+        return None
+
+    numerator = bnb_reserve * busd_reserve
+    denominator = token_reserve * 10 ** (18 - decimals) * bnb_lp_reserve
+    if ratio:
+        weight, counterweight = pool_weights(ratio)
+        numerator *= weight
+        denominator *= counterweight
+
+    if not denominator:
+        return None
+
+    scaled = numerator * 10 ** PLACES
+    quotient, remainder = divmod(scaled, denominator)
+
+    # Distance to the nearest rounding tie, compared with Decimal's worst-case error
+    if abs(2 * remainder - denominator) * ERROR_BOUND <= 2 * scaled:
+        return None
+
+    if 2 * remainder > denominator:
+        quotient += 1
+
+    if quotient >= 10 ** PRECISION:
+        return None
+
+    return Decimal(quotient).scaleb(-PLACES)
+
+
+@lru_cache(maxsize=None)
+def pool_weights(ratio):
+    """Integer weights for a weighted pool, exactly as get_price's float -> str -> Decimal conversion sees them."""
+    weight, counterweight = Fraction(str(ratio / 100)), Fraction(str((100 - ratio) / 100))
+    return weight.numerator * counterweight.denominator, weight.denominator * counterweight.numerator
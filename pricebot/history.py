@@ -0,0 +1,155 @@
+import re
+import time
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from pricebot.commands.models.prices import PriceRollup, PriceTick
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+
+# Rollup resolution -> seconds of history kept (None keeps everything)
+ROLLUPS = {MINUTE: 7 * DAY, HOUR: 365 * DAY, DAY: None}
+RAW_RETENTION = 2 * DAY
+
+WINDOW_UNITS = {'m': MINUTE, 'h': HOUR, 'd': DAY, 'w': 7 * DAY, 'y': 365 * DAY}
+
+
+def parse_window(text):
+    """Parse windows like `30m`, `24h` or `7d` into seconds; returns None if invalid."""
+    match = re.fullmatch(r'(\d+)\s*([mhdwy])', (text or '').strip().lower())
+    if not match or not int(match[1]):
+        return None
+
+    return int(match[1]) * WINDOW_UNITS[match[2]]
+
+
+class PriceHistory:
+    """Append-only price ticks with 1m/1h/1d OHLC rollups for one token.
+
+    Ticks and rollup changes are buffered in memory and handed to the DBWriter in
+    batches; each batch upserts the touched rollup buckets and, hourly, prunes rows
+    past their retention.
+    Queries read the coarsest rollup that still resolves the requested window.
+    """
+
+    def __init__(self, engine, writer, token, batch_size=20, raw_retention=RAW_RETENTION, rollups=ROLLUPS):
+        self.engine = engine
+        self.writer = writer
+        self.token = token
+        self.batch_size = batch_size
+        self.raw_retention = raw_retention
+        self.rollups = rollups
+        self.ticks = []
+        self.buckets = {}
+        self.last_prune = 0
+
+    def record(self, price, timestamp=None):
+        timestamp = int(timestamp or time.time())
+        price = float(price)
+        self.ticks.append({'token': self.token, 'timestamp': timestamp, 'price': price})
+
+        for resolution in self.rollups:
+            key = (resolution, timestamp - timestamp % resolution)
+            if bucket := self.buckets.get(key):
+                bucket['high'] = max(bucket['high'], price)
+                bucket['low'] = min(bucket['low'], price)
+                bucket['close'] = price
+            else:
+                self.buckets[key] = {'token': self.token, 'resolution': key[0], 'bucket': key[1],
+                                     'open': price, 'high': price, 'low': price, 'close': price}
+
+        if len(self.ticks) >= self.batch_size:
+            self.flush()
+
+    def pending_writes(self):
+        """Hand over the buffered ticks and rollup buckets, leaving the buffers empty."""
+        ticks, buckets = self.ticks, list(self.buckets.values())
+        self.ticks, self.buckets = [], {}
+        return ticks, buckets
+
+    def flush(self, now=None):
+        ticks, buckets = self.pending_writes()
+        prune = (now := now or time.time()) - self.last_prune >= HOUR
+        if prune:
+            self.last_prune = now
+
+        def write(session):
+            self.write(session, ticks, buckets)
+            if prune:
+                self.prune(session, now)
+
+        self.writer.submit(write)
+
+    @staticmethod
+    def write(db, ticks, buckets):
+        if ticks:
+            db.execute(insert(PriceTick), ticks)
+
+        if buckets:
+            upsert = sqlite_insert(PriceRollup)
+            db.execute(upsert.on_conflict_do_update(
+                index_elements=['token', 'resolution', 'bucket'],
+                set_={
+                    'high': func.max(PriceRollup.high, upsert.excluded.high),
+                    'low': func.min(PriceRollup.low, upsert.excluded.low),
+                    'close': upsert.excluded.close,
+                },
+            ), buckets)
+
+    def prune(self, db, now):
+        db.execute(delete(PriceTick).where(and_(PriceTick.token == self.token, PriceTick.timestamp < now - self.raw_retention)))
+        for resolution, retention in self.rollups.items():
+            if retention:
+                db.execute(delete(PriceRollup).where(and_(
+                    PriceRollup.token == self.token, PriceRollup.resolution == resolution, PriceRollup.bucket < now - retention
+                )))
+
+    def resolution_for(self, window):
+        for resolution, retention in sorted(self.rollups.items()):
+            if window / resolution <= 1440 and (not retention or retention >= window):
+                return resolution
+
+        return max(self.rollups)
+
+    def candles(self, window, now=None, resolution=None):
+        """OHLC rows covering the last `window` seconds, oldest first, including unflushed buckets."""
+        now = int(now or time.time())
+        resolution = resolution or self.resolution_for(window)
+        start = now - window
+        start -= start % resolution
+
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(PriceRollup.bucket, PriceRollup.open, PriceRollup.high, PriceRollup.low, PriceRollup.close)
+                .where(and_(PriceRollup.token == self.token, PriceRollup.resolution == resolution, PriceRollup.bucket >= start))
+                .order_by(PriceRollup.bucket)
+            )
+            candles = {row.bucket: [row.open, row.high, row.low, row.close] for row in rows}
+
+        for (bucket_resolution, bucket), values in self.buckets.items():
+            if bucket_resolution == resolution and bucket >= start:
+                if existing := candles.get(bucket):
+                    existing[1] = max(existing[1], values['high'])
+                    existing[2] = min(existing[2], values['low'])
+                    existing[3] = values['close']
+                else:
+                    candles[bucket] = [values['open'], values['high'], values['low'], values['close']]
+
+        return [(bucket, *candles[bucket]) for bucket in sorted(candles)]
+
+    def change(self, window, now=None):
+        """Return (opening price, latest price) over the window, or None without history."""
+        candles = self.candles(window, now)
+        if not candles:
+            return None
+
+        return candles[0][1], candles[-1][4]
+
+    def range(self, window, now=None):
+        """Return (low, high) over the window, or None without history."""
+        candles = self.candles(window, now)
+        if not candles:
+            return None
+
+        return min(candle[3] for candle in candles), max(candle[2] for candle in candles)
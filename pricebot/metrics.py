@@ -0,0 +1,138 @@
+import contextlib
+import threading
+import time
+from collections import defaultdict, deque
+
+from aiohttp import web
+
+QUANTILES = (0.5, 0.95, 0.99)
+NULL_TIMER = contextlib.nullcontext()
+
+
+class Timer:
+    __slots__ = ('metrics', 'key', 'started')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.observe_key(self.key, time.perf_counter() - self.started)
+        if exc_type:
+            name, labels = self.key
+            self.metrics.inc_key(('errors_total', tuple(sorted(labels + (('timer', name), ('type', exc_type.__name__))))))
+
+
+class Metrics:
+    """Process-wide timers and counters for the hot paths.
+
+    Timers keep the last `window` observations per series for percentiles, plus
+    running totals. While disabled, `timer` hands back a shared no-op context and
+    `inc` returns immediately, so instrumented code pays almost nothing.
+    """
+
+    def __init__(self, window=500):
+        self.enabled = False
+        self.window = window
+        self.samples = {}
+        self.totals = defaultdict(lambda: [0, 0.0])
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+        self.server = None
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def timer(self, name, **labels):
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, self.key(name, labels))
+
+    def observe(self, name, seconds, **labels):
+        if self.enabled:
+            self.observe_key(self.key(name, labels), seconds)
+
+    def observe_key(self, key, seconds):
+        with self.lock:
+            if key not in self.samples:
+                self.samples[key] = deque(maxlen=self.window)
+            self.samples[key].append(seconds)
+            total = self.totals[key]
+            total[0] += 1
+            total[1] += seconds
+
+    def inc(self, name, value=1, **labels):
+        if self.enabled:
+            self.inc_key(self.key(name, labels), value)
+
+    def inc_key(self, key, value=1):
+        with self.lock:
+            self.counters[key] += value
+
+    def percentiles(self):
+        """Yield (name, labels, count, {quantile: seconds}) for every timer series."""
+        with self.lock:
+            series = [(key, sorted(samples), self.totals[key][0]) for key, samples in self.samples.items()]
+
+        for (name, labels), ordered, count in sorted(series):
+            values = {q: ordered[min(len(ordered) - 1, int(len(ordered) * q))] for q in QUANTILES}
+            yield name, dict(labels), count, values
+
+    def render(self):
+        """Render every series in the Prometheus text exposition format."""
+        lines = []
+        seen = set()
+        for name, labels, count, values in self.percentiles():
+            metric = f'pricebot_{name}'
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} summary')
+            for quantile, value in values.items():
+                lines.append(f'{metric}{format_labels({**labels, "quantile": quantile})} {value:.6f}')
+            total = self.totals[self.key(name, labels)]
+            lines.append(f'{metric}_count{format_labels(labels)} {count}')
+            lines.append(f'{metric}_sum{format_labels(labels)} {total[1]:.6f}')
+
+        with self.lock:
+            counters = sorted(self.counters.items())
+        for (name, labels), value in counters:
+            metric = f'pricebot_{name}'
+            if metric not in seen:
+                seen.add(metric)
+                lines.append(f'# TYPE {metric} counter')
+            lines.append(f'{metric}{format_labels(dict(labels))} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+    async def serve(self, host='127.0.0.1', port=9108):
+        """Serve /metrics on a local port; only the first call starts a server."""
+        if self.server:
+            return
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type='text/plain')
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        self.server = web.AppRunner(app)
+        await self.server.setup()
+        try:
+            await web.TCPSite(self.server, host, port).start()
+        except OSError:
+            await self.server.cleanup()
+            self.server = None
+            raise
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels.items()) + '}'
+
+
+metrics = Metrics()
@@ -1,5 +1,9 @@
 import json
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
 from decimal import Decimal, DecimalException
 from urllib.parse import urlparse
 
@@ -7,9 +11,24 @@ import discord
 from discord.ext import tasks, commands
 from urllib.request import urlopen, Request
 from web3 import Web3
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
+from pricebot import fixedpoint
+from pricebot.chain import ChainReader, CircuitBreaker, Snapshot, MULTICALL_ADDRESS
+from pricebot.dbwriter import get_writer
+from pricebot.dispatch import EditDispatcher
+from pricebot.events import NodeLogSource, SyncWatcher, pair_fields
+from pricebot.feed import FeedSubscriber
+from pricebot.metrics import metrics
+from pricebot.routing import PairGraph, load_route_graph
+from pricebot.rpc import PoolProvider
+from pricebot.scheduler import RefreshScheduler, budget
+from pricebot.stats import format_age
+
+# BscScan rate-limits keyless requests hard, so ABI fetches go one at a time even when tokens are prepared in parallel
+bscscan_lock = threading.Lock()
+BSCSCAN_RETRIES = 5
+
 def fetch_abi(contract):
     if not os.path.exists('contracts'):
         os.mkdir('./contracts')
@@ -19,23 +38,153 @@ def fetch_abi(contract):
         with open(filename, 'r') as abi_file:
             abi = abi_file.read()
     else:
-        # TODO: Error handling
         url = 'https://api.bscscan.com/api?module=contract&action=getabi&address=' + contract
-        abi_response = urlopen(Request(url, headers={'User-Agent': 'Mozilla'})).read().decode('utf8')
-        abi = json.loads(abi_response)['result']
+        for attempt in range(BSCSCAN_RETRIES):
+            with bscscan_lock:
+                abi_response = json.loads(urlopen(Request(url, headers={'User-Agent': 'Mozilla'})).read().decode('utf8'))
+            if abi_response.get('status') == '1':
+                break
+
+            if 'rate limit' not in str(abi_response.get('result')).lower() or attempt == BSCSCAN_RETRIES - 1:
+                raise Exception(f"Could not fetch the ABI for {contract}: {abi_response.get('result')}")
+            time.sleep(2 ** attempt)
+        abi = abi_response['result']
 
         with open(filename, 'w') as abi_file:
             abi_file.write(abi)
 
     return json.loads(abi)
 
+# The only contract functions the bot calls
+ABI_FUNCTIONS = {'balanceOf', 'totalSupply', 'decimals', 'token0', 'token1', 'getFinalTokens'}
+
+def load_abi(contract):
+    """Return the contract's ABI trimmed to ABI_FUNCTIONS, cached as contracts/<contract>.min.json."""
+    filename = f'contracts/{contract}.min.json'
+    if os.path.exists(filename):
+        with open(filename, 'r') as abi_file:
+            return json.load(abi_file)
+
+    abi = [item for item in fetch_abi(contract) if item.get('type') == 'function' and item.get('name') in ABI_FUNCTIONS]
+    with open(filename, 'w') as abi_file:
+        json.dump(abi, abi_file)
+
+    return abi
+
+def load_pair_metadata(chain, token):
+    """Return the LP's pair tokens and the token's decimals, cached as contracts/<lp>.meta.json."""
+    filename = f"contracts/{token['lp']}.meta.json"
+    if os.path.exists(filename):
+        with open(filename, 'r') as meta_file:
+            return json.load(meta_file)
+
+    lp = chain.web3.eth.contract(address=token['lp'], abi=token['lp_abi'])
+    weighted = any(item['name'] == 'getFinalTokens' for item in token['lp_abi'])
+    reads = {'decimals': (chain.web3.eth.contract(address=token['contract'], abi=token['abi']), 'decimals')}
+    if weighted:
+        reads['pair'] = (lp, 'getFinalTokens')
+    else:
+        reads['token0'], reads['token1'] = (lp, 'token0'), (lp, 'token1')
+
+    values, _ = chain.read(reads)
+    metadata = {
+        'weighted': weighted,
+        'pair': list(values['pair']) if weighted else [values['token0'], values['token1']],
+        'decimals': values['decimals'],
+    }
+
+    with open(filename, 'w') as meta_file:
+        json.dump(metadata, meta_file)
+
+    return metadata
+
+def prepare_token(token, config):
+    """Fill in a token's ABIs, pair tokens and decimals from the contracts/ cache or the chain."""
+    if not os.path.exists('contracts'):
+        os.mkdir('./contracts')
+
+    if 'abi' not in token:
+        # Plugin bots may call any of the token's functions, so they keep the full ABI
+        token['abi'] = fetch_abi(token['contract']) if config.get('plugin') else load_abi(token['contract'])
+    if 'lp_abi' not in token:
+        token['lp_abi'] = load_abi(token['lp'])
+
+    if 'pair' not in token:
+        metadata = load_pair_metadata(get_chain(config), token)
+        token['pair'], token['weighted'] = metadata['pair'], metadata['weighted']
+        token.setdefault('decimals', metadata['decimals'])
+
+    if config.get('routing') and 'route' not in token:
+        token['route'] = load_route_graph(get_chain(config), token['contract'], config['amm'], config.get('route_bases'))
+
+    return token
+
+def prepare_tokens(entries, workers=4):
+    """Prepare every (token, config) pair concurrently, reporting how long startup metadata took."""
+    started = time.perf_counter()
+    cold = not all(
+        os.path.exists(f"contracts/{token['lp']}.meta.json") and os.path.exists(f"contracts/{token['contract']}.min.json")
+        for token, _ in entries
+    )
+
+    if not os.path.exists('contracts'):
+        os.mkdir('./contracts')
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # ABIs first, so shared addresses are fetched once before pair metadata needs them.
+        # BscScan requests are serialized inside fetch_abi; cached ABIs and chain probes still run in parallel
+        addresses = {address for token, _ in entries for address in (token['contract'], token['lp'])}
+        abis = dict(zip(addresses, executor.map(load_abi, addresses)))
+        for token, config in entries:
+            if not config.get('plugin'):
+                token.setdefault('abi', abis[token['contract']])
+            token.setdefault('lp_abi', abis[token['lp']])
+
+        list(executor.map(lambda entry: prepare_token(*entry), entries))
+
+    print(f"Prepared {len(entries)} token(s) in {time.perf_counter() - started:.2f}s ({'cold' if cold else 'warm'} start)")
+
+chains = {}
+chains_lock = threading.Lock()
+
+def get_chain(config):
+    """Return the ChainReader for the configured node(s), shared by every bot in this process."""
+    node = config.get('bsc_node')
+    if not node:
+        raise Exception("Required setting 'bsc_node' not configured!")
+
+    nodes = tuple(node) if isinstance(node, list) else (node,)
+    with chains_lock:
+        if nodes not in chains:
+            chains[nodes] = create_chain(nodes, config)
+
+    return chains[nodes]
+
+def create_chain(nodes, config):
+    timeout = config.get('rpc_timeout', 10)
+    if len(nodes) > 1:
+        if not all('http' in urlparse(uri).scheme for uri in nodes):
+            raise Exception("Multiple 'bsc_node' endpoints must all be HTTP RPC URLs!")
+        provider = PoolProvider(nodes, timeout=timeout, hedge_percentile=config.get('rpc_hedge_percentile', 95),
+                                hedge_multiple=config.get('rpc_hedge_multiple', 3),
+                                eject_after=config.get('rpc_eject_after', 3), eject_seconds=config.get('rpc_eject_seconds', 30))
+    elif 'http' in (bsc_node := urlparse(nodes[0])).scheme:
+        provider = Web3.HTTPProvider(nodes[0], request_kwargs={'timeout': timeout})
+    else:
+        provider = Web3.IPCProvider(bsc_node.path, timeout=timeout)
+
+    breaker = CircuitBreaker(config.get('breaker_threshold', 3), config.get('breaker_backoff', 5),
+                             config.get('breaker_max_backoff', 300))
+    return ChainReader(Web3(provider), config.get('multicall', MULTICALL_ADDRESS),
+                       workers=config.get('rpc_workers', 4), timeout=timeout, breaker=breaker)
+
 def list_cogs(directory):
     basedir = (os.path.basename(os.path.dirname(__file__)))
     return (f"{basedir}.{directory}.{f.rstrip('.py')}" for f in os.listdir(basedir + '/' + directory) if f.endswith('.py'))
 
 class PriceBot(commands.Bot):
-    contracts = {}
     config = {}
+    engine = None
     current_price = 0
     nickname = ''
     bnb_amount = 0
@@ -43,6 +192,11 @@ class PriceBot(commands.Bot):
     token_amount = 0
     lp_price = 0
     total_supply = 0
+    snapshot = None
+    last_good = 0  # time.monotonic() of the last snapshot that priced the token
+    sync_watcher = None
+    priceloop = None
+    last_resync = 0
     display_precision = Decimal('0.0001')  # Round to 4 token_decimals
 
     # Static BSC contract addresses
@@ -63,33 +217,43 @@ class PriceBot(commands.Bot):
         if not config['amm'].get(token['from']):
             raise Exception(f"{token['name']}'s AMM {token['from']} does not exist!")
 
-        if node := config.get('bsc_node'):
-            bsc_node = urlparse(node)
-            if 'http' in bsc_node.scheme:
-                provider = Web3.HTTPProvider(node)
-            else:
-                provider = Web3.IPCProvider(bsc_node.path)
-
-            self.web3 = Web3(provider)  # type: Web3.eth.account
-        else:
-            raise Exception("Required setting 'bsc_node' not configured!")
+        self.chain = get_chain(config)
+        self.web3 = self.chain.web3  # type: Web3
+        prepare_token(self.token, config)
 
+        self.contracts = {}
         self.contracts['bnb'] = self.web3.eth.contract(address=self.address['bnb'], abi=self.token['abi'])
         self.contracts['busd'] = self.web3.eth.contract(address=self.address['busd'], abi=self.token['abi'])
         self.contracts['token'] = self.web3.eth.contract(address=self.token['contract'], abi=self.token['abi'])
-        self.contracts['lp'] = self.web3.eth.contract(address=self.token['lp'], abi=fetch_abi(self.token['lp']))
-
-        if 'getFinalTokens' in self.contracts['lp'].functions.__dict__:
-            pair_info = self.contracts['lp'].functions.getFinalTokens().call()
-        else:
-            pair_info = [self.contracts['lp'].functions.token0().call(), self.contracts['lp'].functions.token1().call()]
+        self.contracts['lp'] = self.web3.eth.contract(address=self.token['lp'], abi=self.token['lp_abi'])
+
+        self.weighted_pool = self.token['weighted']
+        self.pair_info = self.token['pair']
+
+        self.router = None
+        if config.get('routing'):
+            self.router = PairGraph(self.web3, token['contract'], token['route'], config.get('route_mode', 'deepest'))
+
+        if config.get('feed'):
+            # Snapshots come from a feed process (see feed.py) instead of this process's own reads
+            self.engine = FeedSubscriber(self, config['feed'])
+        elif config.get('sync_events'):
+            if self.router:
+                print(f"{token['name']} is priced over a route graph; polling reserves instead of Sync events.")
+            elif self.weighted_pool:
+                print(f"{token['name']}'s LP does not emit Sync events; polling balances instead.")
+            else:
+                self.sync_watcher = SyncWatcher(NodeLogSource(self.chain), self.sync_pairs())
 
-        if not self.token.get('decimals'):
-            self.token['decimals'] = self.contracts['token'].functions.decimals().call()
+        self.scheduler = self.make_scheduler()
+        budget.limit = config.get('rpc_budget') or budget.limit
 
         self.help_command = commands.DefaultHelpCommand(command_attrs={"hidden": True})
+        metrics.enabled = metrics.enabled or bool(config.get('metrics'))
+        self.edits = EditDispatcher(self, concurrency=config.get('edit_concurrency', 5))
 
-        self.dbengine = create_engine('sqlite:///pricebot.db', echo=self.config.get('debug', False))
+        self.writer = get_writer('sqlite:///pricebot.db', echo=self.config.get('debug', False))
+        self.dbengine = self.writer.engine
         session = sessionmaker(bind=self.dbengine)
         self.db = session()
 
@@ -119,19 +283,72 @@ class PriceBot(commands.Bot):
     def get_icon(self):
         return self.token['emoji'] or self.token['icon'] or self.token['name']
 
-    def get_bnb_price(self, lp):
-        bnb_amount = Decimal(self.contracts['bnb'].functions.balanceOf(lp).call())
-        busd_amount = Decimal(self.contracts['busd'].functions.balanceOf(lp).call())
-
-        self.bnb_price = Decimal(busd_amount) / Decimal(bnb_amount)
+    def snapshot_reads(self):
+        lp = self.contracts['lp'].address
+        reads = {
+            'token_reserve': (self.contracts['token'], 'balanceOf', lp),
+            'bnb_reserve': (self.contracts['bnb'], 'balanceOf', lp),
+            'lp_supply': (self.contracts['lp'], 'totalSupply'),
+            'bnb_lp_bnb': (self.contracts['bnb'], 'balanceOf', self.amm['address']),
+            'bnb_lp_busd': (self.contracts['busd'], 'balanceOf', self.amm['address']),
+        }
+        if self.router:
+            reads.update(self.router.reads())
+
+        return reads
+
+    def build_snapshot(self, values, block):
+        reserves = tuple(values.pop(name) for name in self.router.reads()) if self.router else ()
+        return Snapshot(block=block, reserves=reserves, **values)
+
+    def fetch_snapshot(self):
+        values, block = self.chain.read(self.snapshot_reads())
+        return self.build_snapshot(values, block)
+
+    async def fetch_snapshot_async(self):
+        values, block = await self.chain.read_async(self.snapshot_reads())
+        return self.build_snapshot(values, block)
+
+    def make_scheduler(self):
+        config = self.config
+        base_rate = config.get('event_poll_rate', config['refresh_rate']) if self.sync_watcher else config['refresh_rate']
+        return RefreshScheduler(self.token['name'], base_rate, config.get('refresh_min'), config.get('refresh_max'),
+                                move=config.get('refresh_move', 0.002), commands=config.get('refresh_commands', 3))
+
+    def sync_pairs(self):
+        return {
+            self.token['lp']: pair_fields(self.token['contract'], self.address['bnb'], 'token_reserve', 'bnb_reserve'),
+            self.amm['address']: pair_fields(self.address['bnb'], self.address['busd'], 'bnb_lp_bnb', 'bnb_lp_busd'),
+        }
+
+    async def fetch_event_snapshot(self):
+        """Apply new Sync events to the last snapshot, with a full read every `resync_rate` seconds.
+
+        Returns None when neither pair has traded since the last poll.
+        """
+        if not self.snapshot or time.monotonic() - self.last_resync >= self.config.get('resync_rate', 300):
+            snapshot = await self.fetch_snapshot_async()
+            self.sync_watcher.start(snapshot.block)
+            self.last_resync = time.monotonic()
+            return snapshot
+
+        updates, block = await self.chain.run(self.sync_watcher.poll)
+        if updates:
+            return replace(self.snapshot, block=block, **updates)
+
+    def get_bnb_price(self, snapshot):
+        self.bnb_price = Decimal(snapshot.bnb_lp_busd) / Decimal(snapshot.bnb_lp_bnb)
 
         return self.bnb_price
 
-    def get_price(self, token_contract, native_lp, bnb_lp):
-        self.bnb_amount = Decimal(self.contracts['bnb'].functions.balanceOf(native_lp).call())
-        self.token_amount = Decimal(token_contract.functions.balanceOf(native_lp).call()) * Decimal(10 ** (18 - self.token["decimals"]))  # Normalize token_decimals
+    def load_amounts(self, snapshot):
+        self.bnb_amount = Decimal(snapshot.bnb_reserve)
+        self.token_amount = Decimal(snapshot.token_reserve) * Decimal(10 ** (18 - self.token["decimals"]))  # Normalize token_decimals
 
-        bnb_price = self.get_bnb_price(bnb_lp)
+        return self.get_bnb_price(snapshot)
+
+    def get_price(self, snapshot):
+        bnb_price = self.load_amounts(snapshot)
 
         try:
             if ratio := self.token.get('ratio'):
@@ -144,19 +361,46 @@ class PriceBot(commands.Bot):
 
         return final_price
 
-    def get_token_price(self):
-        return self.get_price(self.contracts['token'], self.token['lp'], self.amm['address']).quantize(self.display_precision)
-
-    def generate_presence(self):
-        if not self.token_amount:
+    def get_token_price(self, snapshot=None):
+        snapshot = snapshot or self.fetch_snapshot()
+        if not snapshot.bnb_lp_bnb or not (snapshot.reserves or snapshot.token_reserve):
+            # Keep pricing from the last good snapshot rather than dividing by an empty pool
+            raise ValueError(f"Snapshot at block {snapshot.block} has an empty reserve")
+
+        self.snapshot = snapshot
+        self.last_good = time.monotonic()
+
+        if self.router and snapshot.reserves:
+            token_price, bnb_price = self.router.prices(snapshot.reserves)
+            if token_price:
+                self.load_amounts(snapshot)
+                self.bnb_price = bnb_price or self.bnb_price
+                return token_price.quantize(self.display_precision)
+
+        # Integer fast path; it declines (None) whenever it can't match the Decimal result exactly
+        price = fixedpoint.token_price(snapshot.bnb_reserve, snapshot.token_reserve, self.token['decimals'],
+                                       snapshot.bnb_lp_busd, snapshot.bnb_lp_bnb, self.token.get('ratio'))
+        if price is not None:
+            self.load_amounts(snapshot)
+            return price
+
+        return self.get_price(snapshot).quantize(self.display_precision)
+
+    def stale_age(self):
+        """The age of the last good snapshot, formatted, once it is older than `stale_after` seconds."""
+        if self.last_good and (age := time.monotonic() - self.last_good) >= self.config.get('stale_after', 300):
+            return format_age(age)
+
+    def generate_presence(self, price=None):
+        if not self.token_amount or not self.snapshot or not self.snapshot.lp_supply:
             return ''
 
         try:
-            self.total_supply = self.contracts['lp'].functions.totalSupply().call()
+            self.total_supply = self.snapshot.lp_supply
             values = [Decimal(self.token_amount / self.total_supply), Decimal(self.bnb_amount / self.total_supply)]
 
-            total_token_price = Decimal(self.contracts['token'].functions.balanceOf(self.contracts['lp'].address).call()) * self.current_price
-            total_bnb_price = Decimal(self.contracts['bnb'].functions.balanceOf(self.contracts['lp'].address).call()) * self.bnb_price
+            total_token_price = Decimal(self.snapshot.token_reserve) * (price or self.current_price)
+            total_bnb_price = Decimal(self.snapshot.bnb_reserve) * self.bnb_price
 
             self.lp_price = (total_token_price + total_bnb_price) / self.total_supply
 
@@ -164,16 +408,33 @@ class PriceBot(commands.Bot):
         except ValueError:
             pass
 
-    def generate_nickname(self):
-        return f"{self.token.get('icon', self.token['name'])} ${self.current_price:.4f} ({round(self.current_price / self.bnb_price, 4):.4f})"
+    def generate_nickname(self, price=None):
+        price = price or self.current_price
+        icon = self.token.get('icon', self.token['name'])
+        if age := self.stale_age():
+            return f"{icon} ${price:.4f} (stale {age})"
+
+        bnb_ratio = round(price / self.bnb_price, 4) if self.bnb_price else 0
+        return f"{icon} ${price:.4f} ({bnb_ratio:.4f})"
 
     async def get_lp_value(self):
-        self.total_supply = self.contracts['lp'].functions.totalSupply().call()
+        # From the last good snapshot, so answering never waits on (or fails with) the node
+        self.total_supply = self.snapshot.lp_supply if self.snapshot else 0
+        if not self.total_supply:
+            return None
+
         return [self.token_amount / self.total_supply, self.bnb_amount / self.total_supply]
 
+    async def close(self):
+        await super().close()
+        self.writer.close()
+
     async def on_guild_join(self, guild):
         await guild.me.edit(nick=self.nickname)
 
+    async def on_guild_remove(self, guild):
+        self.edits.forget(guild.id)
+
     async def check_restrictions(self, ctx):
         server_restriction = self.config.get('restrict_to', {}).get(ctx.guild.id)
         if server_restriction and not await self.is_owner(ctx.author):
@@ -184,6 +445,9 @@ class PriceBot(commands.Bot):
         return True
 
     async def on_ready(self):
+        if self.engine:
+            self.engine.start(self.loop)
+
         restrictions = self.config.get('restrict_to', {})
         all_channels = self.get_all_channels()
         for guild_id, channels in restrictions.items():
@@ -193,6 +457,13 @@ class PriceBot(commands.Bot):
                     if not channels[i]:
                         raise Exception('No channel named channel!')
 
+        if self.config.get('metrics') and self.config.get('metrics_port'):
+            try:
+                await metrics.serve(port=self.config['metrics_port'])
+            except OSError as e:
+                # Another process serving the shared metrics_port, usually; this one keeps running without
+                print(f"Could not serve {self.token['name']} metrics on port {self.config['metrics_port']}.", e)
+
     @staticmethod
     def parse_int(val):
         try:
@@ -211,7 +482,7 @@ class PriceBot(commands.Bot):
 
         return val
 
-    def exec(self):
+    def load_cogs(self):
         for cog in list_cogs('commands'):
             try:
                 if self.token.get('command_override'):
@@ -222,4 +493,6 @@ class PriceBot(commands.Bot):
             except Exception as e:
                 print(f'Failed to load extension {cog}.', e)
 
+    def exec(self):
+        self.load_cogs()
         self.run(self.token['apikey'])
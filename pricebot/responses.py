@@ -0,0 +1,60 @@
+import asyncio
+from collections import OrderedDict
+
+from pricebot.metrics import metrics
+
+
+class ResponseCache:
+    """Command responses for the current price snapshot.
+
+    Responses are keyed by (command, normalized argument, snapshot generation);
+    `invalidate` starts a new generation whenever a snapshot arrives. Identical
+    requests made while the first is still being built wait on that build, so a
+    burst of the same command costs a single computation. Empty (None) responses
+    are shared with waiters but not cached.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.generation = 0
+        self.responses = OrderedDict()
+        self.inflight = {}
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def invalidate(self):
+        self.generation += 1
+        self.responses.clear()
+
+    async def get(self, command, argument, build):
+        """Return the cached response, or await `build()` once for everyone asking."""
+        key = (command, argument, self.generation)
+
+        if key in self.responses:
+            self.count(command, 'hits')
+            return self.responses[key]
+
+        if key in self.inflight:
+            self.count(command, 'coalesced')
+            return await asyncio.shield(self.inflight[key])
+
+        self.count(command, 'misses')
+        future = self.inflight[key] = asyncio.get_event_loop().create_future()
+        try:
+            response = await build()
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved here, so a build nobody else waited on doesn't log a warning
+            raise
+        else:
+            future.set_result(response)
+            if response is not None and key[2] == self.generation:
+                self.responses[key] = response
+                if len(self.responses) > self.maxsize:
+                    self.responses.popitem(last=False)
+            return response
+        finally:
+            del self.inflight[key]
+
+    def count(self, command, result):
+        self.stats[result] += 1
+        metrics.inc('response_cache_total', command=command, result=result)
@@ -0,0 +1,162 @@
+import json
+import os
+from decimal import Decimal
+from itertools import combinations
+
+from web3 import Web3
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+# Common BSC bases a token may be paired against; BUSD and USDT are priced at $1
+BASES = {
+    'WBNB': '0xbb4CdB9CBd36B01bD1cBaEBF2De08d9173bc095c',
+    'BUSD': '0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56',
+    'USDT': '0x55d398326f99059fF775485246999027B3197955',
+    'CAKE': '0x0E09FaBB73Bd3Ade0a17ECC321fD13a19e81cE82',
+}
+STABLES = ('BUSD', 'USDT')
+
+FACTORY_ABI = [{
+    'name': 'getPair', 'type': 'function', 'stateMutability': 'view',
+    'inputs': [{'name': 'tokenA', 'type': 'address'}, {'name': 'tokenB', 'type': 'address'}],
+    'outputs': [{'name': 'pair', 'type': 'address'}],
+}]
+PAIR_ABI = [
+    {'name': 'getReserves', 'type': 'function', 'stateMutability': 'view', 'inputs': [],
+     'outputs': [{'name': 'reserve0', 'type': 'uint112'}, {'name': 'reserve1', 'type': 'uint112'},
+                 {'name': 'blockTimestampLast', 'type': 'uint32'}]},
+    {'name': 'token0', 'type': 'function', 'stateMutability': 'view', 'inputs': [],
+     'outputs': [{'name': '', 'type': 'address'}]},
+    {'name': 'token1', 'type': 'function', 'stateMutability': 'view', 'inputs': [],
+     'outputs': [{'name': '', 'type': 'address'}]},
+]
+DECIMALS_ABI = [{'name': 'decimals', 'type': 'function', 'stateMutability': 'view', 'inputs': [],
+                 'outputs': [{'name': '', 'type': 'uint8'}]}]
+
+
+def discover_pairs(chain, token, amms, bases):
+    """Find every pair between the token and the bases on each AMM factory, in two batched reads."""
+    web3 = chain.web3
+    nodes = [token] + [base for base in bases if base != token]
+
+    reads = {}
+    for amm, info in amms.items():
+        factory = web3.eth.contract(address=Web3.toChecksumAddress(info['factory']), abi=FACTORY_ABI)
+        for a, b in combinations(nodes, 2):
+            reads[(amm, a, b)] = (factory, 'getPair', a, b)
+
+    values, _ = chain.read(reads)
+    found = {(amm, address) for (amm, _, _), address in values.items() if address != ZERO_ADDRESS}
+
+    reads = {('decimals', node): (web3.eth.contract(address=node, abi=DECIMALS_ABI), 'decimals') for node in nodes}
+    for amm, address in found:
+        pair = web3.eth.contract(address=address, abi=PAIR_ABI)
+        reads[('token0', address)], reads[('token1', address)] = (pair, 'token0'), (pair, 'token1')
+
+    values, _ = chain.read(reads)
+    return {
+        'amms': sorted(amms),
+        'bases': list(bases),
+        'pairs': [{'address': address, 'amm': amm, 'token0': values[('token0', address)], 'token1': values[('token1', address)]}
+                  for amm, address in sorted(found)],
+        'decimals': {node: values[('decimals', node)] for node in nodes},
+    }
+
+
+def load_route_graph(chain, token, amms, bases=None):
+    """Return the token's pair graph, cached as contracts/<token>.route.json.
+
+    Only AMMs with a `factory` take part. The cache is rebuilt when the AMMs or
+    bases it was discovered with change.
+    """
+    amms = {name: info for name, info in amms.items() if info.get('factory')}
+    bases = [Web3.toChecksumAddress(base) for base in (bases or BASES.values())]
+
+    token = Web3.toChecksumAddress(token)
+    filename = f'contracts/{token}.route.json'
+    if os.path.exists(filename):
+        with open(filename, 'r') as route_file:
+            graph = json.load(route_file)
+        if graph['amms'] == sorted(amms) and graph['bases'] == bases:
+            return graph
+
+    graph = discover_pairs(chain, token, amms, bases)
+    with open(filename, 'w') as route_file:
+        json.dump(graph, route_file)
+
+    return graph
+
+
+class PairGraph:
+    """Prices a token in USD over a graph of AMM pairs, refreshed from one batched reserve read.
+
+    Every base is first priced from the stablecoins along its widest path, i.e.
+    the path whose shallowest pool holds the most USD value, leaving out the
+    token's own pools. The token is then priced from each pool it shares with a
+    priced base: `deepest` takes the pool with the most liquidity behind it,
+    `weighted` averages all of them by that liquidity.
+    """
+
+    def __init__(self, web3, token, graph, mode='deepest'):
+        self.token = Web3.toChecksumAddress(token)
+        self.mode = mode
+        self.pairs = graph['pairs']
+        self.decimals = graph['decimals']
+        self.contracts = [web3.eth.contract(address=pair['address'], abi=PAIR_ABI) for pair in self.pairs]
+        self.stables = {BASES[name] for name in STABLES}
+        self.bnb = BASES['WBNB']
+
+    def reads(self):
+        return {('reserves', i): (contract, 'getReserves') for i, contract in enumerate(self.contracts)}
+
+    def amounts(self, reserves):
+        """Yield (token_a, token_b, amount_a, amount_b) for every pool with liquidity, in whole tokens."""
+        for pair, (reserve0, reserve1, *_) in zip(self.pairs, reserves):
+            if reserve0 and reserve1:
+                token0, token1 = pair['token0'], pair['token1']
+                yield (token0, token1, Decimal(reserve0) / 10 ** self.decimals[token0],
+                       Decimal(reserve1) / 10 ** self.decimals[token1])
+
+    def base_prices(self, pools):
+        prices = {stable: Decimal(1) for stable in self.stables}
+        depth = {stable: Decimal('Infinity') for stable in self.stables}
+        settled = set()
+
+        while unsettled := [node for node in depth if node not in settled]:
+            node = max(unsettled, key=depth.get)
+            settled.add(node)
+            for token_a, token_b, amount_a, amount_b in pools:
+                if node not in (token_a, token_b):
+                    continue
+
+                other, amount, other_amount = (token_b, amount_a, amount_b) if node == token_a else (token_a, amount_b, amount_a)
+                liquidity = min(depth[node], amount * prices[node])
+                if other not in settled and liquidity > depth.get(other, -1):
+                    depth[other] = liquidity
+                    prices[other] = prices[node] * amount / other_amount
+
+        return prices, depth
+
+    def prices(self, reserves):
+        """Return (token price, BNB price) in USD; either is None when no pool path reaches it."""
+        pools = list(self.amounts(reserves))
+        prices, depth = self.base_prices([pool for pool in pools if self.token not in pool[:2]])
+
+        quotes = []
+        for token_a, token_b, amount_a, amount_b in pools:
+            if self.token not in (token_a, token_b):
+                continue
+
+            base, amount, token_amount = (token_b, amount_b, amount_a) if token_a == self.token else (token_a, amount_a, amount_b)
+            if base in prices:
+                quotes.append((prices[base] * amount / token_amount, min(depth[base], amount * prices[base])))
+
+        if not quotes:
+            return None, prices.get(self.bnb)
+
+        if self.mode == 'weighted':
+            price = sum(price * weight for price, weight in quotes) / sum(weight for _, weight in quotes)
+        else:
+            price = max(quotes, key=lambda quote: quote[1])[0]
+
+        return price, prices.get(self.bnb)
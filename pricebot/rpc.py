@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import requests
+from web3.providers.base import JSONBaseProvider
+
+from pricebot.metrics import metrics
+
+
+class Endpoint:
+    """One node in the pool, with a keep-alive session and a rolling health record."""
+
+    def __init__(self, uri, window=100):
+        self.uri = uri
+        self.session = requests.Session()
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_errors = 0
+        self.ejected_until = 0
+        self.ejections = 0
+
+    def healthy(self, now):
+        return now >= self.ejected_until
+
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0
+
+    def percentile(self, percent):
+        if not self.latencies:
+            return None
+
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+    def score(self):
+        """Lower is better: median latency, penalized by the recent error rate."""
+        return (self.percentile(50) or 0) * (1 + 10 * self.error_rate())
+
+    def record(self, latency, ok):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.consecutive_errors = 0
+        else:
+            self.consecutive_errors += 1
+
+
+class PoolProvider(JSONBaseProvider):
+    """A web3 provider spreading requests over several HTTP nodes.
+
+    Requests go to the healthiest endpoint. If it hasn't answered once its own
+    `hedge_percentile` latency has passed, the same request is hedged to the next
+    endpoint and whichever answers first wins. The hedge delay is capped at
+    `hedge_multiple` times the endpoint's median, so a node whose spikes make up
+    its own high percentile still gets hedged well before a spike runs its
+    course. Failures fail over to the next
+    endpoint, and an endpoint that keeps failing is ejected for `eject_seconds`.
+    """
+
+    def __init__(self, uris, timeout=10, hedge_percentile=95, hedge_multiple=3, min_samples=20, eject_after=3, eject_seconds=30):
+        super().__init__()
+        self.endpoints = [Endpoint(uri) for uri in uris]
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_multiple = hedge_multiple
+        self.min_samples = min_samples
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=len(self.endpoints) * 4, thread_name_prefix='rpc')
+        self.hedged = 0
+
+    def ranked(self):
+        now = time.monotonic()
+        with self.lock:
+            healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy(now)]
+            # With every node ejected, the least recently ejected one gets another chance
+            return sorted(healthy, key=Endpoint.score) or sorted(self.endpoints, key=lambda endpoint: endpoint.ejected_until)
+
+    def send(self, endpoint, data):
+        started = time.monotonic()
+        try:
+            response = endpoint.session.post(endpoint.uri, data=data, timeout=self.timeout,
+                                             headers={'Content-Type': 'application/json'})
+            response.raise_for_status()
+        except Exception:
+            self.record(endpoint, time.monotonic() - started, False)
+            metrics.inc('rpc_endpoint_errors_total', endpoint=endpoint.uri)
+            raise
+
+        latency = time.monotonic() - started
+        self.record(endpoint, latency, True)
+        metrics.observe('rpc_endpoint_seconds', latency, endpoint=endpoint.uri)
+        return response.content
+
+    def record(self, endpoint, latency, ok):
+        with self.lock:
+            endpoint.record(latency, ok)
+            failing = len(endpoint.outcomes) >= self.min_samples and endpoint.error_rate() > 0.5
+            if not ok and (endpoint.consecutive_errors >= self.eject_after or failing):
+                metrics.inc('rpc_ejections_total', endpoint=endpoint.uri)
+                endpoint.ejections += 1
+                endpoint.ejected_until = time.monotonic() + self.eject_seconds
+                endpoint.consecutive_errors = 0
+                endpoint.outcomes.clear()
+
+    def hedge_delay(self, endpoint):
+        if len(endpoint.latencies) < self.min_samples:
+            return self.timeout
+
+        delay = endpoint.percentile(self.hedge_percentile)
+        if self.hedge_multiple:
+            delay = min(delay, endpoint.percentile(50) * self.hedge_multiple)
+
+        return delay
+
+    def post(self, data):
+        """Send raw JSON-RPC bytes (a single request or a batch) and return the raw response."""
+        candidates = self.ranked()
+        pending = {self.executor.submit(self.send, candidates[0], data)}
+        delay = self.hedge_delay(candidates[0])
+        remaining = candidates[1:]
+        error = None
+
+        while pending:
+            done, pending = wait(pending, timeout=delay if remaining else self.timeout * 2, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+
+            if not remaining:
+                continue
+
+            # Either the request failed (fail over) or it is slower than usual (hedge)
+            if not done:
+                self.hedged += 1
+                metrics.inc('rpc_hedged_total')
+            endpoint, remaining = remaining[0], remaining[1:]
+            pending.add(self.executor.submit(self.send, endpoint, data))
+            delay = self.hedge_delay(endpoint)
+
+        raise error or TimeoutError('No RPC endpoint answered')
+
+    def make_request(self, method, params):
+        return self.decode_rpc_response(self.post(self.encode_rpc_request(method, params)))
+
+    def isConnected(self):
+        return any(endpoint.healthy(time.monotonic()) for endpoint in self.endpoints)
+
+    def status(self):
+        now = time.monotonic()
+        return [{
+            'uri': endpoint.uri,
+            'healthy': endpoint.healthy(now),
+            'p50': endpoint.percentile(50),
+            'p95': endpoint.percentile(95),
+            'error_rate': endpoint.error_rate(),
+            'ejections': endpoint.ejections,
+        } for endpoint in self.endpoints]
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from collections import deque
+
+from pricebot.metrics import metrics
+
+schedulers = []
+
+
+class RpcBudget:
+    """Token bucket of price ticks per minute, shared by every token in the process.
+
+    Each tick is one batched node read, so this caps node load however many
+    tokens are polling fast at once. A limit of None never waits.
+    """
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.waited = 0.0
+
+    def delay(self):
+        if not self.limit:
+            return 0
+
+        now = time.monotonic()
+        self.tokens = min(self.limit, self.tokens + (now - self.updated) * self.limit / 60)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+
+        return (1 - self.tokens) * 60 / self.limit
+
+    async def acquire(self):
+        while wait := self.delay():
+            self.waited += wait
+            metrics.inc('rpc_budget_waits_total')
+            await asyncio.sleep(wait)
+
+
+budget = RpcBudget()
+
+
+class RefreshScheduler:
+    """Adapts a token's refresh interval to its price moves and command traffic.
+
+    A tick that moved the price by at least `move` (relative), or that saw
+    `commands` or more commands since the previous tick, halves the interval down
+    to `minimum`. A tick with an unchanged price stretches it by half, up to
+    `maximum`. A burst of commands wakes a waiting loop straight away.
+    """
+
+    def __init__(self, name, base, minimum=None, maximum=None, move=0.002, commands=3, window=600):
+        self.name = name
+        self.base = base
+        self.minimum = minimum or base
+        self.maximum = max(maximum or base * 4, self.minimum)
+        self.interval = min(max(base, self.minimum), self.maximum)
+        self.move = move
+        self.commands = commands
+        self.command_count = 0
+        self.last_price = None
+        self.ticks = deque()
+        self.window = window
+        self.wakeup = asyncio.Event()
+        schedulers.append(self)
+
+    def note_command(self):
+        self.command_count += 1
+        if self.command_count >= self.commands and self.interval > self.minimum:
+            self.wakeup.set()
+
+    def record(self, price):
+        """Adjust the interval after a tick that priced the token at `price`."""
+        now = time.monotonic()
+        self.ticks.append(now)
+        while now - self.ticks[0] > self.window:
+            self.ticks.popleft()
+
+        moved = abs(price - self.last_price) / self.last_price if self.last_price else 0
+        if moved >= self.move or self.command_count >= self.commands:
+            self.interval = max(self.minimum, self.interval / 2)
+        elif self.last_price is not None and price == self.last_price:
+            self.interval = min(self.maximum, self.interval * 1.5)
+
+        self.last_price = price
+        self.command_count = 0
+        metrics.inc('scheduler_ticks_total', token=self.name)
+
+    def effective_rate(self):
+        """Ticks per minute over the recent window."""
+        if len(self.ticks) < 2:
+            return 60 / self.interval
+
+        return (len(self.ticks) - 1) * 60 / max(self.ticks[-1] - self.ticks[0], 1e-9)
+
+    def savings(self):
+        """Share of the fixed-rate ticks this scheduler skipped."""
+        return max(0.0, 1 - self.effective_rate() / (60 / self.base))
+
+    async def run(self, tick):
+        while True:
+            started = time.monotonic()
+            self.wakeup.clear()
+            await budget.acquire()
+            try:
+                await tick()
+            except Exception as e:
+                print(f"{self.name} refresh failed.", e)
+
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), max(0, self.interval - (time.monotonic() - started)))
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,144 @@
+import math
+import time
+
+from pricebot.history import DAY, HOUR, MINUTE
+
+WINDOWS = (5 * MINUTE, HOUR, DAY)
+
+
+def format_window(seconds):
+    for unit, size in (('d', DAY), ('h', HOUR), ('m', MINUTE)):
+        if seconds >= size and not seconds % size:
+            return f'{seconds // size}{unit}'
+
+    return f'{seconds}s'
+
+
+def format_age(seconds):
+    for unit, size in (('d', DAY), ('h', HOUR), ('m', MINUTE)):
+        if seconds >= size:
+            return f'{int(seconds // size)}{unit}'
+
+    return f'{int(seconds)}s'
+
+
+class RollingWindow:
+    """Time-weighted price statistics over the last `seconds`, kept in `slots` fixed buckets.
+
+    Each tick updates the current bucket and the running totals in O(1); buckets
+    older than the window are subtracted from the totals as the clock moves past
+    them. High, low and the opening price scan the fixed set of buckets.
+    """
+
+    def __init__(self, seconds, slots=60):
+        self.seconds = seconds
+        self.slots = slots
+        self.slot_seconds = seconds / slots
+        self.slot_ids = [None] * slots
+        self.weighted = [0.0] * slots  # Sum of price * seconds held
+        self.held = [0.0] * slots  # Seconds covered
+        self.squares = [0.0] * slots  # Sum of squared log returns
+        self.opens = [None] * slots
+        self.highs = [None] * slots
+        self.lows = [None] * slots
+        self.weighted_total = 0.0
+        self.held_total = 0.0
+        self.squares_total = 0.0
+        self.current = None
+
+    def advance(self, slot):
+        """Expire every bucket between the last one written and `slot`."""
+        start = slot - self.slots + 1 if self.current is None else max(self.current + 1, slot - self.slots + 1)
+        for expired in range(start, slot + 1):
+            i = expired % self.slots
+            if self.slot_ids[i] is not None:
+                self.weighted_total -= self.weighted[i]
+                self.held_total -= self.held[i]
+                self.squares_total -= self.squares[i]
+            self.slot_ids[i] = expired
+            self.weighted[i] = self.held[i] = self.squares[i] = 0.0
+            self.opens[i] = self.highs[i] = self.lows[i] = None
+        self.current = slot
+
+    def add(self, price, previous, held, now):
+        """Record `price` at `now`, crediting `previous` for the `held` seconds since the last tick."""
+        slot = int(now // self.slot_seconds)
+        if self.current is None or slot > self.current:
+            self.advance(slot)
+        slot = self.current  # A clock stepping backwards keeps writing to the newest bucket
+
+        i = slot % self.slots
+        held = min(held, self.seconds)  # After a long gap the previous price only covers this window
+        if previous is not None:
+            self.weighted[i] += previous * held
+            self.held[i] += held
+            self.weighted_total += previous * held
+            self.held_total += held
+            if previous > 0 and price > 0:
+                square = math.log(price / previous) ** 2
+                self.squares[i] += square
+                self.squares_total += square
+
+        if self.opens[i] is None:
+            self.opens[i] = previous if previous is not None else price
+            self.highs[i] = self.lows[i] = self.opens[i]
+        self.highs[i] = max(self.highs[i], price)
+        self.lows[i] = min(self.lows[i], price)
+
+    def live(self):
+        return [i for i in range(self.slots) if self.slot_ids[i] is not None and self.opens[i] is not None]
+
+    def twap(self, last, since):
+        """The time-weighted average, counting `last` as held for the `since` seconds since the last tick."""
+        held = self.held_total + since
+        return (self.weighted_total + last * since) / held if held > 0 else last
+
+    def summary(self, last, since):
+        live = self.live()
+        if not live:
+            return None
+
+        oldest = min(live, key=lambda i: self.slot_ids[i])
+        opened = self.opens[oldest]
+        return {
+            'twap': self.twap(last, since),
+            'high': max(self.highs[i] for i in live),
+            'low': min(self.lows[i] for i in live),
+            'change': (last - opened) / opened * 100 if opened else 0,
+            'volatility': math.sqrt(max(self.squares_total, 0)) * 100,  # Realized, in percent
+        }
+
+
+class PriceStats:
+    """Rolling TWAP, high/low, % change and volatility for one token across several windows."""
+
+    def __init__(self, windows=WINDOWS, slots=60):
+        self.windows = {seconds: RollingWindow(seconds, slots) for seconds in sorted(set(windows))}
+        self.last_price = None
+        self.last_time = None
+
+    def record(self, price, now=None):
+        now = now or time.time()
+        price = float(price)
+        held = now - self.last_time if self.last_time is not None else 0
+        for window in self.windows.values():
+            window.add(price, self.last_price, held, now)
+
+        self.last_price, self.last_time = price, now
+
+    def twap(self, seconds, now=None):
+        if self.last_price is None:
+            return None
+
+        since = (now or time.time()) - self.last_time
+        return self.windows[seconds].twap(self.last_price, since)
+
+    def summary(self, now=None):
+        """Yield (window seconds, statistics) for every window with data."""
+        if self.last_price is None:
+            return
+
+        since = (now or time.time()) - self.last_time
+        for seconds, window in self.windows.items():
+            if stats := window.summary(self.last_price, since):
+                yield seconds, stats